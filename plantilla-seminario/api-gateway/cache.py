@@ -0,0 +1,97 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: dict
+    body: bytes
+    expires_at: float
+
+
+class ResponseCache:
+    """Caché LRU de respuestas GET con TTL por entrada y memoria acotada.
+
+    Se limita tanto el número de entradas como el total de bytes de los cuerpos;
+    al superar cualquiera de los dos se expulsan las entradas menos usadas.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(service_name: str, path: str, query_params, vary: str = "") -> tuple:
+        """Clave normalizada: el orden de los query params no genera entradas distintas."""
+        return (service_name, path.strip("/"), tuple(sorted(query_params.multi_items())), vary)
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: tuple, status_code: int, headers: dict, body: bytes, ttl: float) -> None:
+        if len(body) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = CachedResponse(status_code, headers, body, time.monotonic() + ttl)
+        self._bytes += len(body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, service_name: str, path: str) -> int:
+        """Elimina las entradas del recurso modificado, de sus sub-recursos y de sus colecciones padre.
+
+        Un PUT a experiences/123 invalida experiences/123 y el listado experiences.
+        """
+        path = path.strip("/")
+        stale = [
+            key for key in self._entries
+            if key[0] == service_name and (
+                key[1] == path
+                or key[1].startswith(path + "/")
+                or path.startswith(key[1] + "/")
+            )
+        ]
+        for key in stale:
+            self._remove(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: tuple) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.body)
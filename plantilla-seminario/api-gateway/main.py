@@ -1,10 +1,22 @@
 from fastapi import FastAPI, APIRouter, Request, HTTPException
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from starlette.background import BackgroundTask
+from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Union
+from cache import ResponseCache
+from resilience import CircuitBreaker, LatencyTracker, backoff_delay, hedge
+from routing import Route, RouteTable
+from singleflight import SingleFlight
+from common.tokens import TokenCodec, TokenError, load_keys
+import asyncio
+import httpx
+import ipaddress
+import json
 import logging
 logging.basicConfig(level=logging.WARNING)
 import os
+import time
 
 # Define la instancia de la aplicación FastAPI.
 app = FastAPI(title="API Gateway Taller Microservicios")
@@ -27,197 +39,458 @@ router = APIRouter(prefix="/api/v1")
 # El puerto debe ser el del contenedor (ej. auth-service:8001).
 SERVICES = {
     "auth": os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001"),
-    # TODO: Agrega los URLs de los otros microservicios de tu tema.
-    # "service1_name": os.getenv("NAME1_SERVICE_URL", "http://service1-service:8002"),
-    # "service2_name": os.getenv("NAME2_SERVICE_URL", "http://service2-service:8003"),
-    # "service3_name": os.getenv("NAME3_SERVICE_URL", "http://service3-service:8004"),
+    # experiences service container name is `experiences-service` in docker-compose
+    "experiences": os.getenv("EXPERIENCES_SERVICE_URL", "http://experiences-service:8002"),
+    "reservations": os.getenv("RESERVATIONS_SERVICE_URL", "http://reservations-service:8004"),
+    "ratings": os.getenv("RATINGS_SERVICE_URL", "http://ratings-service:8005"),
 }
 
 # Timeout (seconds) para las llamadas HTTP entre servicios
 REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "3"))
 
-# Add the remaining services to the SERVICES dictionary
-SERVICES.update({
-    "experiences": os.getenv("EXPERIENCES_SERVICE_URL", "http://service1-service:8002"),
-    "reservations": os.getenv("RESERVATIONS_SERVICE_URL", "http://reservations-service:8004"),
-    "ratings": os.getenv("RATINGS_SERVICE_URL", "http://ratings-service:8005"),
-})
 
-# Add the remaining services to the SERVICES dictionary
-@router.get("/{service_name}/{path:path}")
-async def forward_get(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-    
-    service_url = f"{SERVICES[service_name]}/{path}"
-    
-    try:
-        response = requests.get(service_url, params=request.query_params, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
-
-# TODO: Implementa una ruta genérica para redirigir peticiones POST.
-from fastapi import FastAPI, APIRouter, Request, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-import requests
-import os
+# El catálogo de experiencias se consulta en casi todas las páginas del frontend,
+# así que por defecto se cachea unos segundos en el gateway.
+DEFAULT_CACHE_TTL = {"experiences": "5"}
+# Servicios cuyos GET idénticos y concurrentes se agrupan en una sola petición al upstream.
+DEFAULT_COALESCE = {"experiences": "true"}
+
+
+# Límites del pool de conexiones, protocolo y política de reenvío por servicio.
+# Cada valor se puede ajustar por servicio con <SERVICIO>_<CLAVE> (ej. RATINGS_MAX_CONNECTIONS)
+# o de forma global con <CLAVE> (ej. MAX_CONNECTIONS).
+def _setting(service_name: str, key: str, default: str) -> str:
+    return os.getenv(f"{service_name.upper()}_{key}", os.getenv(key, default))
+
+
+def _enabled(service_name: str, key: str, default: str) -> bool:
+    return _setting(service_name, key, default).lower() in ("1", "true", "yes")
+
+
+SERVICE_SETTINGS = {
+    name: {
+        "timeout": float(_setting(name, "REQUEST_TIMEOUT", str(REQUEST_TIMEOUT))),
+        "max_connections": int(_setting(name, "MAX_CONNECTIONS", "100")),
+        "max_keepalive_connections": int(_setting(name, "MAX_KEEPALIVE_CONNECTIONS", "20")),
+        "keepalive_expiry": float(_setting(name, "KEEPALIVE_EXPIRY", "30")),
+        # HTTP/2 se negocia por ALPN sobre TLS; sobre http:// plano se mantiene HTTP/1.1 keep-alive.
+        "http2": _enabled(name, "HTTP2", "false"),
+        # Reintentos de GET (idempotente) ante fallos de red o respuestas 5xx,
+        # con backoff exponencial y jitter entre RETRY_BACKOFF y RETRY_BACKOFF_MAX segundos.
+        "retries": int(_setting(name, "RETRIES", "1")),
+        "retry_backoff": float(_setting(name, "RETRY_BACKOFF", "0.05")),
+        "retry_backoff_max": float(_setting(name, "RETRY_BACKOFF_MAX", "1")),
+        # Circuit breaker: fallos consecutivos para abrirlo y segundos hasta la petición de prueba.
+        "breaker_failures": int(_setting(name, "BREAKER_FAILURES", "5")),
+        "breaker_reset": float(_setting(name, "BREAKER_RESET", "10")),
+        # GET "hedged": si no hay respuesta tras el percentil HEDGE_PERCENTILE de latencia
+        # (mínimo HEDGE_MIN_DELAY segundos) se lanza una segunda petición y gana la primera.
+        "hedge": _enabled(name, "HEDGE", "false"),
+        "hedge_percentile": float(_setting(name, "HEDGE_PERCENTILE", "95")),
+        "hedge_min_delay": float(_setting(name, "HEDGE_MIN_DELAY", "0.01")),
+        # Segundos que una respuesta GET puede servirse desde caché (0 = sin caché).
+        "cache_ttl": float(_setting(name, "CACHE_TTL", DEFAULT_CACHE_TTL.get(name, "0"))),
+        # Agrupa GET idénticos concurrentes (single-flight); la respuesta se lee completa y se comparte.
+        "coalesce": _enabled(name, "COALESCE", DEFAULT_COALESCE.get(name, "false")),
+    }
+    for name in SERVICES
+}
 
-# Define la instancia de la aplicación FastAPI.
-app = FastAPI(title="API Gateway Taller Microservicios")
 
-# Configura CORS (Cross-Origin Resource Sharing).
-# Esto es esencial para permitir que el frontend se comunique con el gateway.
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Permite peticiones desde cualquier origen (ajustar en producción)
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Tabla de despacho compilada una sola vez a partir de SERVICES:
+# /api/v1/<servicio>/<ruta> se reenvía a <URL del servicio>/<ruta>.
+def build_route_table() -> RouteTable:
+    table = RouteTable()
+    for name in SERVICES:
+        cfg = SERVICE_SETTINGS[name]
+        table.add(name, Route(
+            service_name=name,
+            timeout=cfg["timeout"],
+            retries=cfg["retries"],
+            retry_backoff=cfg["retry_backoff"],
+            retry_backoff_max=cfg["retry_backoff_max"],
+            hedge=cfg["hedge"],
+            hedge_percentile=cfg["hedge_percentile"],
+            hedge_min_delay=cfg["hedge_min_delay"],
+            cache_ttl=cfg["cache_ttl"],
+            coalesce=cfg["coalesce"],
+        ))
+    return table
+
+
+ROUTES = build_route_table()
+
+# Caché de respuestas GET compartida por todos los servicios con cache_ttl > 0.
+# Los POST/PUT/PATCH/DELETE que pasan por el gateway invalidan las entradas del recurso afectado;
+# los cambios que no pasan por el gateway (ej. reservas actualizando el cupo) expiran por TTL.
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+    max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
 )
 
-# Crea un enrutador para las peticiones de los microservicios.
-router = APIRouter(prefix="/api/v1")
+# GET en curso por clave de caché; las peticiones idénticas esperan a la primera.
+inflight_gets = SingleFlight()
 
-# Define los microservicios y sus URLs.
-# La URL debe coincidir con el nombre del servicio definido en docker-compose.yml.
-# El puerto debe ser el del contenedor (ej. auth-service:8001).
-SERVICES = {
-    "auth": os.getenv("AUTH_SERVICE_URL", "http://auth-service:8001"),
+# Estado de resiliencia por servicio: circuit breaker y latencias recientes (para el hedging).
+breakers = {
+    name: CircuitBreaker(
+        failure_threshold=SERVICE_SETTINGS[name]["breaker_failures"],
+        reset_timeout=SERVICE_SETTINGS[name]["breaker_reset"],
+    )
+    for name in SERVICES
 }
+latencies = {name: LatencyTracker() for name in SERVICES}
+
+# Verificación local de los tokens emitidos por el servicio de autenticación (mismas claves,
+# AUTH_SIGNING_KEYS). Si la petición trae un token válido se reenvía la identidad a los
+# microservicios en X-User / X-User-Role; con uno inválido se responde 401 sin contactar al upstream.
+tokens = TokenCodec(load_keys(os.getenv("AUTH_SIGNING_KEYS", "default:supersecretkey")))
+IDENTITY_HEADERS = {"x-user", "x-user-role"}
+# Con AUTH_REQUIRED=true solo los servicios de AUTH_PUBLIC_SERVICES admiten peticiones sin token.
+# En esos servicios el token ni se verifica: un token caducado no debe impedir volver a iniciar sesión.
+AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+AUTH_PUBLIC_SERVICES = set(os.getenv("AUTH_PUBLIC_SERVICES", "auth").split(","))
+
+
+def _identity_headers(headers, service_name: str) -> dict:
+    """Cabeceras de identidad verificadas a partir del token Bearer de la petición."""
+    if service_name in AUTH_PUBLIC_SERVICES:
+        return {}
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        if AUTH_REQUIRED:
+            raise HTTPException(status_code=401, detail="Token requerido")
+        return {}
+    try:
+        claims = tokens.verify(token)
+    except TokenError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    return {"x-user": claims["sub"], "x-user-role": claims.get("role") or ""}
+
+
+# Un cliente asíncrono (con su propio pool keep-alive) por microservicio.
+# Se crean al arrancar el gateway y se reutilizan en todas las peticiones.
+clients: dict[str, httpx.AsyncClient] = {}
+
+
+@app.on_event("startup")
+async def open_clients():
+    for name, url in SERVICES.items():
+        cfg = SERVICE_SETTINGS[name]
+        clients[name] = httpx.AsyncClient(
+            base_url=url,
+            timeout=cfg["timeout"],
+            limits=httpx.Limits(
+                max_connections=cfg["max_connections"],
+                max_keepalive_connections=cfg["max_keepalive_connections"],
+                keepalive_expiry=cfg["keepalive_expiry"],
+            ),
+            http2=cfg["http2"],
+        )
+
+
+@app.on_event("shutdown")
+async def close_clients():
+    for client in clients.values():
+        await client.aclose()
+    clients.clear()
+
+
+# Solo se respeta el X-Forwarded-For que envía un proxy de confianza (GATEWAY_TRUSTED_PROXIES:
+# IPs, redes CIDR o nombres de host como "frontend"); a cualquier otro cliente se le reemplaza
+# por su propia IP, para que no pueda hacerse pasar por otra (p. ej. ante el límite de logins).
+TRUSTED_PROXY_NETWORKS = []
+TRUSTED_PROXY_HOSTS = []
+for entry in filter(None, (p.strip() for p in os.getenv("GATEWAY_TRUSTED_PROXIES", "").split(","))):
+    try:
+        TRUSTED_PROXY_NETWORKS.append(ipaddress.ip_network(entry, strict=False))
+    except ValueError:
+        TRUSTED_PROXY_HOSTS.append(entry)
+# Los nombres de host se resuelven periódicamente (la IP de un contenedor cambia al recrearlo).
+TRUSTED_PROXY_REFRESH = float(os.getenv("GATEWAY_TRUSTED_PROXY_REFRESH", "30"))
+trusted_proxy_ips: set = set()
+
+
+async def resolve_trusted_proxies():
+    global trusted_proxy_ips
+    loop = asyncio.get_running_loop()
+    while True:
+        resolved = set()
+        for host in TRUSTED_PROXY_HOSTS:
+            try:
+                resolved.update(info[4][0] for info in await loop.getaddrinfo(host, None))
+            except OSError:
+                logging.warning("No se pudo resolver el proxy de confianza '%s'", host)
+        trusted_proxy_ips = resolved
+        await asyncio.sleep(TRUSTED_PROXY_REFRESH)
+
+
+@app.on_event("startup")
+async def start_proxy_resolver():
+    if TRUSTED_PROXY_HOSTS:
+        app.state.proxy_resolver = asyncio.create_task(resolve_trusted_proxies())
+
+
+@app.on_event("shutdown")
+async def stop_proxy_resolver():
+    resolver = getattr(app.state, "proxy_resolver", None)
+    if resolver is not None:
+        resolver.cancel()
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    if host in trusted_proxy_ips:
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXY_NETWORKS)
 
-# Timeout (seconds) para las llamadas HTTP entre servicios
-REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "3"))
 
-# Add the remaining services to the SERVICES dictionary
-SERVICES.update({
-    # experiences service container name is `experiences-service` in docker-compose
-    "experiences": os.getenv("EXPERIENCES_SERVICE_URL", "http://experiences-service:8002"),
-    "reservations": os.getenv("RESERVATIONS_SERVICE_URL", "http://reservations-service:8004"),
-    "ratings": os.getenv("RATINGS_SERVICE_URL", "http://ratings-service:8005"),
-})
+# Cabeceras hop-by-hop (RFC 7230, sección 6.1): son propias de cada conexión y no se reenvían.
+# El resto (content-type, content-length, content-encoding, etag, ...) pasa intacto.
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade", "host",
+}
 
 
-@router.get("/{service_name}/{path:path}")
-async def forward_get(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-    
-    service_url = f"{SERVICES[service_name]}/{path}"
-    
+# Cabeceras de respuesta que el servidor del gateway ya añade por su cuenta.
+GATEWAY_RESPONSE_HEADERS = {"date", "server"}
+
+
+def _forwarded_for(headers, client) -> dict:
+    # IP del cliente añadida a la cadena de proxies (la usa, p. ej., el límite de logins);
+    # la cadena recibida solo se conserva si viene de un proxy de confianza
+    previous = headers.get("x-forwarded-for") if _is_trusted_proxy(client.host) else None
+    return {"x-forwarded-for": f"{previous}, {client.host}" if previous else client.host}
+
+
+def _forwardable_headers(headers, service_name: str, client=None) -> dict:
+    # Las cabeceras de identidad solo las pone el gateway tras verificar el token
+    forwarded = {
+        k: v for k, v in headers.items()
+        if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in IDENTITY_HEADERS
+    }
+    forwarded.update(_identity_headers(headers, service_name))
+    if client is not None:
+        forwarded.pop("x-forwarded-for", None)
+        forwarded.update(_forwarded_for(headers, client))
+    # Sin accept-encoding del cliente, httpx pediría gzip y el cuerpo crudo llegaría comprimido.
+    if not any(k.lower() == "accept-encoding" for k in forwarded):
+        forwarded["accept-encoding"] = "identity"
+    return forwarded
+
+
+def _response_headers(headers) -> dict:
+    return {
+        k: v for k, v in headers.items()
+        if k.lower() not in HOP_BY_HOP_HEADERS and k.lower() not in GATEWAY_RESPONSE_HEADERS
+    }
+
+
+async def send_upstream(route: Route, method: str, path: str, params, headers: dict, content=None) -> httpx.Response:
+    """Envía la petición al microservicio y devuelve la respuesta sin leer su cuerpo.
+
+    `content` puede ser un iterador asíncrono (el cuerpo se transmite por trozos
+    sin decodificarlo) o bytes. Quien llama debe consumir la respuesta y cerrarla
+    para devolver la conexión al pool.
+    Si el circuito del servicio está abierto se responde 503 sin contactar al upstream;
+    los GET se reintentan y, si está activado, se duplican (hedging).
+    """
+    client = clients[route.service_name]
+    breaker = breakers[route.service_name]
+    if not breaker.allow():
+        raise HTTPException(status_code=503, detail=f"Service '{route.service_name}' unavailable (circuit open).")
+
+    idempotent = method == "GET"
+    attempts = 1 + route.retries if idempotent else 1
+
+    def send():
+        upstream_request = client.build_request(
+            method,
+            f"/{path}",
+            params=params,
+            headers=headers,
+            content=content,
+            timeout=route.timeout,
+        )
+        return client.send(upstream_request, stream=True)
+
+    for attempt in range(attempts):
+        if attempt:
+            await asyncio.sleep(backoff_delay(attempt - 1, route.retry_backoff, route.retry_backoff_max))
+        can_retry = attempt + 1 < attempts
+        started = time.monotonic()
+        try:
+            if idempotent and route.hedge:
+                p = latencies[route.service_name].percentile(route.hedge_percentile)
+                delay = max(route.hedge_min_delay, p) if p is not None else route.timeout
+                response = await hedge(send, delay, discard=lambda r: r.aclose())
+            else:
+                response = await send()
+        except httpx.HTTPError as e:
+            breaker.record_failure()
+            if can_retry and isinstance(e, httpx.TransportError) and not breaker.is_open:
+                continue
+            raise HTTPException(status_code=500, detail=f"Error forwarding {method} to {route.service_name}: {e}")
+        except BaseException:
+            # Cancelación, desconexión del cliente al leer el cuerpo, etc.: no dice nada del
+            # upstream, así que no cuenta como fallo; solo se libera el hueco de prueba en half_open
+            breaker.release()
+            raise
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+            if can_retry and not breaker.is_open:
+                await response.aclose()
+                continue
+        else:
+            breaker.record_success()
+            latencies[route.service_name].record(time.monotonic() - started)
+        return response
+
+
+async def stream_upstream(route: Route, method: str, path: str, request: Request) -> StreamingResponse:
+    """Reenvía la petición y transmite la respuesta por trozos, sin decodificarla (incluso comprimida)."""
+    content = request.stream() if method in ("POST", "PUT", "PATCH") else None
+    response = await send_upstream(
+        route, method, path, request.query_params, _forwardable_headers(request.headers, route.service_name, request.client), content
+    )
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=_response_headers(response.headers),
+        background=BackgroundTask(response.aclose),
+    )
+
+
+async def fetch_and_store(route: Route, path: str, params, headers: dict, key: tuple) -> tuple:
+    """Lee completa la respuesta del upstream y, si procede, la guarda en la caché."""
+    response = await send_upstream(route, "GET", path, params, headers)
     try:
-        response = requests.get(service_url, params=request.query_params, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        await response.aclose()
+    headers = _response_headers(response.headers)
+    if route.cache_ttl > 0 and response.status_code == 200:
+        response_cache.set(key, response.status_code, headers, body, route.cache_ttl)
+    return response.status_code, headers, body
 
 
-@router.post("/{service_name}/{path:path}")
-async def forward_post(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-    
-    service_url = f"{SERVICES[service_name]}/{path}"
-    
-    try:
-        # Intenta obtener JSON del body; si no es JSON (form data or empty), reenvía raw body or no body.
-        try:
-            body_json = await request.json()
-            response = requests.post(service_url, json=body_json, timeout=REQUEST_TIMEOUT)
-        except Exception:
-            raw_body = await request.body()
-            if raw_body:
-                headers = {k: v for k, v in request.headers.items()}
-                # Forward raw body preserving content-type header
-                response = requests.post(service_url, data=raw_body, headers={"content-type": headers.get("content-type")}, timeout=REQUEST_TIMEOUT)
-            else:
-                response = requests.post(service_url, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to {service_name}: {e}")
+async def get_buffered(route: Route, path: str, params, headers: dict) -> tuple:
+    """GET servido desde la caché del gateway o, en un fallo, desde una única petición compartida al upstream.
 
+    Devuelve (status_code, headers, body, "HIT" | "MISS").
+    """
+    # La identidad forma parte de la clave: un usuario nunca recibe la respuesta cacheada de otro
+    vary = "|".join(headers.get(h, "") for h in ("accept-encoding", "x-user", "x-user-role"))
+    key = ResponseCache.make_key(route.service_name, path, params, vary)
+    if route.cache_ttl > 0:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached.status_code, cached.headers, cached.body, "HIT"
 
-@router.get("/experiences/{path:path}")
-async def forward_experiences(path: str, request: Request):
-    service_url = f"{SERVICES['experiences']}/{path}"
-    try:
-        response = requests.get(service_url, params=request.query_params, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to experiences: {e}")
+    if route.coalesce:
+        status_code, response_headers, body = await inflight_gets.do(
+            key, lambda: fetch_and_store(route, path, params, headers, key)
+        )
+    else:
+        status_code, response_headers, body = await fetch_and_store(route, path, params, headers, key)
+    return status_code, response_headers, body, "MISS"
 
 
-@router.get("/reservations/{path:path}")
-async def forward_reservations(path: str, request: Request):
-    service_url = f"{SERVICES['reservations']}/{path}"
-    try:
-        response = requests.get(service_url, params=request.query_params, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to reservations: {e}")
+async def buffered_get(route: Route, path: str, request: Request) -> Response:
+    status_code, headers, body, cache_state = await get_buffered(
+        route, path, request.query_params, _forwardable_headers(request.headers, route.service_name, request.client)
+    )
+    return Response(content=body, status_code=status_code, headers={**headers, "x-cache": cache_state})
 
 
-@router.get("/ratings/{path:path}")
-async def forward_ratings(path: str, request: Request):
-    service_url = f"{SERVICES['ratings']}/{path}"
-    try:
-        response = requests.get(service_url, params=request.query_params, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to ratings: {e}")
+class SubRequest(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    path: str  # Igual que tras /api/v1, ej. "/experiences/experiences/123"
+    # Valores escalares (ej. {"limit": 200}); httpx los convierte a texto en la URL
+    query: Dict[str, Union[str, int, float, bool]] = {}
+    body: Optional[Any] = None
 
 
-@router.post("/experiences/{path:path}")
-async def forward_experiences_post(path: str, request: Request):
-    service_url = f"{SERVICES['experiences']}/{path}"
-    try:
-        body_json = await request.json()
-        response = requests.post(service_url, json=body_json, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding request to experiences: {e}")
-
-
-@router.put("/{service_name}/{path:path}")
-async def forward_put(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
-        raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-    service_url = f"{SERVICES[service_name]}/{path}"
+class BatchRequest(BaseModel):
+    requests: List[SubRequest]
+
+
+# Máximo de sub-peticiones aceptadas en una sola llamada a /api/v1/batch.
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+
+
+def _decode_body(headers: dict, body: bytes):
+    if "json" in headers.get("content-type", ""):
+        try:
+            return json.loads(body)
+        except ValueError:
+            pass
+    return body.decode("utf-8", errors="replace")
+
+
+async def run_subrequest(sub: SubRequest, request: Request) -> dict:
+    """Ejecuta una sub-petición del batch con la misma política que una petición directa al gateway."""
+    method = sub.method.upper()
+    match = ROUTES.resolve(sub.path)
+    if match is None:
+        service_name = sub.path.lstrip("/").split("/", 1)[0]
+        return {"id": sub.id, "status": 404, "body": {"detail": f"Service '{service_name}' not found."}}
+    route, path = match
+    params = httpx.QueryParams(sub.query)
+    headers = {"accept": "application/json", "accept-encoding": "identity"}
+    if request.client is not None:
+        headers.update(_forwarded_for(request.headers, request.client))
     try:
-        body = await request.json()
-        response = requests.put(service_url, json=body, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding PUT to {service_name}: {e}")
-
-
-@router.delete("/{service_name}/{path:path}")
-async def forward_delete(service_name: str, path: str, request: Request):
-    if service_name not in SERVICES:
+        headers.update(_identity_headers(request.headers, route.service_name))
+        if method == "GET":
+            status_code, response_headers, body, _ = await get_buffered(route, path, params, headers)
+        else:
+            content = None
+            if sub.body is not None:
+                content = json.dumps(sub.body).encode()
+                headers["content-type"] = "application/json"
+            response = await send_upstream(route, method, path, params, headers, content)
+            try:
+                body = await response.aread()
+            finally:
+                await response.aclose()
+            status_code, response_headers = response.status_code, _response_headers(response.headers)
+            response_cache.invalidate(route.service_name, path)
+    except HTTPException as e:
+        return {"id": sub.id, "status": e.status_code, "body": {"detail": e.detail}}
+    return {"id": sub.id, "status": status_code, "body": _decode_body(response_headers, body)}
+
+
+# Ejecuta varias sub-peticiones en paralelo contra los pools de los microservicios
+# y devuelve todas las respuestas (cada una con su status y body) en un solo viaje.
+@router.post("/batch")
+async def batch(batch_request: BatchRequest, request: Request):
+    if len(batch_request.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"Batch too large (max {BATCH_MAX_REQUESTS} requests).")
+    results = await asyncio.gather(*[run_subrequest(sub, request) for sub in batch_request.requests])
+    return {"responses": results}
+
+
+# Ruta única para todos los microservicios: la tabla de despacho decide el destino.
+@router.api_route("/{full_path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward(full_path: str, request: Request):
+    match = ROUTES.resolve(full_path)
+    if match is None:
+        service_name = full_path.split("/", 1)[0]
         raise HTTPException(status_code=404, detail=f"Service '{service_name}' not found.")
-    service_url = f"{SERVICES[service_name]}/{path}"
-    try:
-        response = requests.delete(service_url, timeout=REQUEST_TIMEOUT)
-        content = response.content
-        content_type = response.headers.get("content-type", "application/json")
-        return Response(content=content, status_code=response.status_code, media_type=content_type)
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error forwarding DELETE to {service_name}: {e}")
+    route, path = match
+    if request.method == "GET" and (route.cache_ttl > 0 or route.coalesce):
+        return await buffered_get(route, path, request)
+    response = await stream_upstream(route, request.method, path, request)
+    if request.method != "GET":
+        response_cache.invalidate(route.service_name, path)
+    return response
 
 
 # Incluye el router en la aplicación principal.
@@ -229,3 +502,23 @@ def health_check():
     return {"status": "ok", "message": "API Gateway is running."}
 
 
+# Contadores de la caché de respuestas (aciertos, fallos, expulsiones, invalidaciones)
+# y de los GET agrupados por single-flight.
+@app.get("/cache/stats")
+def cache_stats():
+    return {**response_cache.stats(), "singleflight": inflight_gets.stats()}
+
+
+# Verificaciones de token (aciertos de la caché de tokens verificados, rechazos, claves activas).
+@app.get("/auth/stats")
+def auth_stats():
+    return tokens.stats()
+
+
+# Estado de cada upstream: circuit breaker y percentiles de latencia recientes.
+@app.get("/upstreams")
+def upstreams_status():
+    return {
+        name: {"circuit": breakers[name].snapshot(), "latency": latencies[name].snapshot()}
+        for name in SERVICES
+    }
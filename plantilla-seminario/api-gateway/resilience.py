@@ -0,0 +1,140 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+
+class CircuitBreaker:
+    """Circuit breaker por servicio: closed -> open -> half_open -> closed.
+
+    Tras `failure_threshold` fallos consecutivos el circuito se abre y las
+    peticiones fallan al instante. Pasados `reset_timeout` segundos deja pasar
+    `half_open_max_calls` peticiones de prueba: si una tiene éxito se cierra,
+    si falla vuelve a abrirse. Si una prueba no llega a registrar resultado,
+    pasados otros `reset_timeout` segundos se deja salir una nueva.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.probe_started_at = 0.0
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        """Indica si una petición puede salir hacia el upstream (y la cuenta si es de prueba)."""
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.half_open_calls = 0
+        elif self.state == self.HALF_OPEN and now - self.probe_started_at >= self.reset_timeout:
+            # Las pruebas anteriores no devolvieron resultado (cancelada, cliente desconectado...)
+            self.half_open_calls = 0
+        if self.state == self.OPEN or (
+            self.state == self.HALF_OPEN and self.half_open_calls >= self.half_open_max_calls
+        ):
+            self.rejected += 1
+            return False
+        if self.state == self.HALF_OPEN:
+            self.half_open_calls += 1
+            self.probe_started_at = now
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == self.OPEN
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.state = self.CLOSED
+
+    def release(self) -> None:
+        """Cierra una petición sin resultado (cancelada por el cliente): no cuenta como fallo,
+        pero si era una prueba en half_open deja libre su hueco."""
+        if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+class LatencyTracker:
+    """Ventana deslizante con las últimas latencias (segundos) de un servicio."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        return {
+            "samples": len(self._samples),
+            "p50_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "p99_ms": _ms(self.percentile(99)),
+        }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Espera antes del reintento `attempt` (0, 1, ...) con backoff exponencial y jitter completo."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def hedge(call: Callable[[], Awaitable], delay: float, discard: Callable[[object], Awaitable]):
+    """Lanza `call()`; si no ha respondido tras `delay` segundos lanza una segunda copia.
+
+    Devuelve el primer resultado correcto y descarta el otro con `discard`
+    (p. ej. cerrar la respuesta para liberar la conexión). Solo falla si fallan ambas.
+    """
+    first = asyncio.ensure_future(call())
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done:
+        return first.result()
+
+    pending = {first, asyncio.ensure_future(call())}
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        winners = [task for task in done if task.exception() is None]
+        if not winners:
+            error = next(iter(done)).exception()
+            continue
+        for task in winners[1:]:
+            await discard(task.result())
+        for task in pending:
+            task.cancel()
+            task.add_done_callback(lambda t: _discard_late(t, discard))
+        return winners[0].result()
+    raise error
+
+
+def _discard_late(task: asyncio.Future, discard: Callable[[object], Awaitable]) -> None:
+    if not task.cancelled() and task.exception() is None:
+        asyncio.ensure_future(discard(task.result()))
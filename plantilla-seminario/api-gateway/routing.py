@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Route:
+    """Destino de un prefijo de ruta y la política con la que se le reenvían las peticiones."""
+    service_name: str
+    timeout: float
+    retries: int = 0
+    retry_backoff: float = 0.05
+    retry_backoff_max: float = 1.0
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_delay: float = 0.01
+    cache_ttl: float = 0.0
+    coalesce: bool = False
+
+
+class _Node:
+    __slots__ = ("children", "route")
+
+    def __init__(self):
+        self.children = {}
+        self.route = None
+
+
+class RouteTable:
+    """Trie de segmentos de ruta.
+
+    La resolución recorre tantos nodos como segmentos tenga la ruta pedida
+    (cada paso es una búsqueda en dict), así que su coste no depende del
+    número de servicios registrados. Gana el prefijo registrado más largo.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def add(self, prefix: str, route: Route) -> None:
+        node = self._root
+        for segment in prefix.strip("/").split("/"):
+            node = node.children.setdefault(segment, _Node())
+        node.route = route
+
+    def resolve(self, path: str) -> Optional[Tuple[Route, str]]:
+        """Devuelve (route, resto_de_la_ruta) o None si ningún prefijo coincide."""
+        segments = path.lstrip("/").split("/")
+        node = self._root
+        match = None
+        for i, segment in enumerate(segments):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            if node.route is not None:
+                match = (node.route, "/".join(segments[i + 1:]))
+        return match
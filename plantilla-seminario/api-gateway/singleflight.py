@@ -0,0 +1,37 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una única ejecución.
+
+    Mientras una llamada para una clave está en curso, las siguientes esperan su
+    resultado (o su excepción) en lugar de lanzar otra. La ejecución corre en su
+    propia tarea, así que si el cliente que la inició se desconecta los demás
+    siguen recibiendo el resultado.
+    """
+
+    def __init__(self):
+        self._inflight: dict = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.executions += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        # Marca la excepción como recuperada aunque todos los que esperaban se hayan cancelado.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "executions": self.executions, "shared": self.shared}
@@ -0,0 +1,46 @@
+"""Coste de bcrypt según BCRYPT_ROUNDS y el número de hilos del pool de hashing.
+
+Para cada coste mide la latencia de un hash y de una verificación y el
+throughput de verificaciones (logins/s) con 1..--workers hilos. Sirve para
+elegir BCRYPT_ROUNDS y HASH_WORKERS del servicio de autenticación: cada +1 de
+coste duplica el tiempo por login.
+
+Uso:
+    python benchmarks/bcrypt_bench.py [--rounds 10 11 12 13] [--workers 4] [-n 40]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+def measure(rounds, max_workers, total):
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    started = time.perf_counter()
+    hashed = context.hash("contraseña-de-prueba")
+    hash_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    context.verify("contraseña-de-prueba", hashed)
+    verify_ms = (time.perf_counter() - started) * 1000
+    print(f"rounds={rounds}  hash={hash_ms:.1f}ms  verify={verify_ms:.1f}ms")
+
+    workers = 1
+    while workers <= max_workers:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            started = time.perf_counter()
+            list(pool.map(lambda _: context.verify("contraseña-de-prueba", hashed), range(total)))
+            elapsed = time.perf_counter() - started
+        print(f"  hilos={workers:<3} verificaciones/s={total / elapsed:.1f}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("-n", "--verifications", type=int, default=40)
+    args = parser.parse_args()
+    for rounds in args.rounds:
+        measure(rounds, args.workers, args.verifications)
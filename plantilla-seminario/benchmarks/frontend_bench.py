@@ -0,0 +1,64 @@
+"""Tiempo de render de páginas del frontend contra un gateway simulado.
+
+Renderiza cada página --requests veces con el cliente de pruebas de Flask (en
+el mismo proceso, con una sesión iniciada) y reporta p50/p95 por página. El
+gateway es stub_upstream.py, que responde a cualquier ruta tras STUB_DELAY_MS:
+
+    cd benchmarks && STUB_DELAY_MS=20 uvicorn stub_upstream:app --port 8000
+    API_GATEWAY_URL=http://localhost:8000 python benchmarks/frontend_bench.py
+    API_GATEWAY_URL=http://localhost:8000 python benchmarks/frontend_bench.py --no-keepalive
+
+Con --no-keepalive cada llamada al gateway abre una conexión nueva, como hacían
+las llamadas sueltas a requests.get/post antes del cliente compartido; con
+--sequential las llamadas de fan_out se hacen una detrás de otra.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend"))
+
+import gateway  # noqa: E402
+from app import app  # noqa: E402
+
+PAGES = {
+    "reservar (experiencia + disponibilidad)": ("/experiences/bench/reserve", "turista"),
+    "experiencias": ("/experiences", "turista"),
+    "mis reservas": ("/my-reservations", "turista"),
+    "panel de guía": ("/guide-panel", "guia"),
+}
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main(total):
+    client = app.test_client()
+    for name, (path, role) in PAGES.items():
+        with client.session_transaction() as session:
+            session["username"] = "bench"
+            session["role"] = role
+        client.get(path)  # calentamiento (abre la conexión del pool)
+        samples = []
+        for _ in range(total):
+            started = time.perf_counter()
+            client.get(path)
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        print(f"{name:<42} p50={percentile(samples, 50) * 1000:.1f}ms  p95={percentile(samples, 95) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--requests", type=int, default=50)
+    parser.add_argument("--no-keepalive", action="store_true")
+    parser.add_argument("--sequential", action="store_true")
+    args = parser.parse_args()
+    if args.sequential:
+        gateway._fan_out_pool = ThreadPoolExecutor(max_workers=1)
+    if args.no_keepalive:
+        gateway.http.headers["Connection"] = "close"
+    main(args.requests)
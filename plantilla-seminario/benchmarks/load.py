@@ -0,0 +1,63 @@
+"""Generador de carga HTTP: lanza peticiones concurrentes y reporta throughput y percentiles.
+
+Uso:
+    python benchmarks/load.py URL [--method GET] [--json '{"k": "v"}'] [-n 2000] [-c 200]
+
+Ejemplos:
+    python benchmarks/load.py http://localhost:8000/api/v1/experiences/experiences -c 300
+    python benchmarks/load.py http://localhost:8004/reservations --method POST \\
+        --json '{"experience_id": "...", "user_id": "bench", "date": "2030-01-01"}'
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run(url, method, body, total, concurrency):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, statuses = [], Counter()
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    resp = await client.request(method, url, json=body)
+                    statuses[resp.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"{method} {url}")
+    print(f"  peticiones={total} concurrencia={concurrency} tiempo={elapsed:.2f}s rps={total / elapsed:.0f}")
+    print("  " + "  ".join(f"p{p}={percentile(latencies, p) * 1000:.1f}ms" for p in (50, 95, 99)))
+    print(f"  estados={dict(statuses)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("url")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--json", default=None)
+    parser.add_argument("-n", "--requests", type=int, default=2000)
+    parser.add_argument("-c", "--concurrency", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.method.upper(), json.loads(args.json) if args.json else None,
+                    args.requests, args.concurrency))
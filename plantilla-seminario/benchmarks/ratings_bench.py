@@ -0,0 +1,99 @@
+"""Throughput del servicio de valoraciones: altas y lecturas filtradas por experiencia en paralelo.
+
+Lanza --requests peticiones con --concurrency en vuelo contra cada URL indicada
+(una mezcla de POST /ratings y GET /ratings?experience_id=...) y reporta
+peticiones por segundo y percentiles de latencia por tipo de petición.
+
+Para comparar con las dos implementaciones anteriores (services/ratings con
+pymongo síncrono y services/service3 antes de la consolidación) se pueden
+levantar desde el commit baseline en otros puertos:
+
+    git worktree add /tmp/ratings-baseline 62e46fa
+    cd /tmp/ratings-baseline/plantilla-seminario/services/ratings && \\
+        DATABASE_URL=mongodb://localhost:27019/ratings_db uvicorn main:app --port 8105
+    cd /tmp/ratings-baseline/plantilla-seminario/services/service3 && uvicorn main:app --port 8106
+
+(service3 del baseline tiene la URL de Mongo fija en el código: hay que
+editar MONGO_DETAILS para apuntar a localhost:27019.)
+
+Uso:
+    python benchmarks/ratings_bench.py actual=http://localhost:8005 \\
+        sync=http://localhost:8105 motor=http://localhost:8106 [-n 4000] [-c 100] [--writes 0.2]
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def run(label, base_url, total, concurrency, write_ratio):
+    experiences = [f"bench-{uuid.uuid4().hex[:8]}" for _ in range(20)]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies, statuses = defaultdict(list), Counter()
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        # Unas valoraciones iniciales para que las lecturas devuelvan datos
+        for experience_id in experiences:
+            await client.post("/ratings", json={
+                "user_id": "bench", "username": "bench", "experience_id": experience_id,
+                "comment": "", "rating": 4,
+            })
+
+        async def worker():
+            while not queue.empty():
+                queue.get_nowait()
+                experience_id = random.choice(experiences)
+                kind = "POST" if random.random() < write_ratio else "GET"
+                started = time.perf_counter()
+                try:
+                    if kind == "POST":
+                        resp = await client.post("/ratings", json={
+                            "user_id": "bench", "username": "bench", "experience_id": experience_id,
+                            "comment": "", "rating": random.randint(1, 5),
+                        })
+                    else:
+                        resp = await client.get("/ratings", params={"experience_id": experience_id})
+                    statuses[resp.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies[kind].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    print(f"{label} ({base_url})")
+    print(f"  peticiones={total} concurrencia={concurrency} tiempo={elapsed:.2f}s rps={total / elapsed:.0f}")
+    for kind, samples in sorted(latencies.items()):
+        samples.sort()
+        print(f"  {kind:<4} n={len(samples)}  " + "  ".join(
+            f"p{p}={percentile(samples, p) * 1000:.1f}ms" for p in (50, 95, 99)
+        ))
+    print(f"  estados={dict(statuses)}")
+
+
+async def main(targets, total, concurrency, write_ratio):
+    for target in targets:
+        label, _, url = target.partition("=")
+        await run(label, url or label, total, concurrency, write_ratio)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("targets", nargs="+", help="etiqueta=URL base del servicio de valoraciones")
+    parser.add_argument("-n", "--requests", type=int, default=4000)
+    parser.add_argument("-c", "--concurrency", type=int, default=100)
+    parser.add_argument("--writes", type=float, default=0.2, help="proporción de POST (0-1)")
+    args = parser.parse_args()
+    asyncio.run(main(args.targets, args.requests, args.concurrency, args.writes))
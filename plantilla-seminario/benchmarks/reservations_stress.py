@@ -0,0 +1,67 @@
+"""Prueba de estrés del cupo de reservas: cientos de reservas en paralelo sobre la misma fecha.
+
+Crea una experiencia con un cupo pequeño, lanza N reservas concurrentes de 1
+persona para la misma fecha y comprueba que el número de reservas aceptadas y
+guardadas es exactamente el cupo (sin sobreventa) y que el resto recibe 400.
+También informa de las reservas por segundo, útil para comparar el rendimiento
+del servicio (con un solo worker de uvicorn) antes y después de un cambio:
+con --cupo igual o mayor que --bookings todas las reservas se aceptan.
+
+Requiere los servicios de experiencias y reservas levantados (docker-compose up).
+
+Uso:
+    python benchmarks/reservations_stress.py [--bookings 500] [--cupo 37]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+
+import httpx
+
+EXPERIENCES_URL = os.getenv("EXPERIENCES_SERVICE_URL", "http://localhost:8002")
+RESERVATIONS_URL = os.getenv("RESERVATIONS_SERVICE_URL", "http://localhost:8004")
+
+
+async def main(bookings: int, cupo: int, date: str):
+    limits = httpx.Limits(max_connections=bookings)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        title = f"stress-{uuid.uuid4().hex[:8]}"
+        await client.post(f"{EXPERIENCES_URL}/experiences", json={
+            "title": title, "description": "prueba de estrés", "price": 1, "guide": "stress", "cupo": cupo,
+        })
+        experiences = (await client.get(f"{EXPERIENCES_URL}/experiences", params={"guide": "stress", "limit": 500})).json()
+        experience_id = next(e["id"] for e in experiences["experiences"] if e["title"] == title)
+
+        async def book(i):
+            resp = await client.post(f"{RESERVATIONS_URL}/reservations", json={
+                "experience_id": experience_id, "user_id": f"stress-{i}", "date": date, "num_personas": 1,
+            })
+            return resp.status_code
+
+        started = time.perf_counter()
+        statuses = Counter(await asyncio.gather(*[book(i) for i in range(bookings)]))
+        elapsed = time.perf_counter() - started
+        stored = [
+            r for r in (await client.get(f"{RESERVATIONS_URL}/reservations")).json()
+            if r["experience_id"] == experience_id
+        ]
+
+    booked = sum(r.get("num_personas", 1) for r in stored)
+    print(f"reservas lanzadas={bookings} cupo={cupo} estados={dict(statuses)} plazas guardadas={booked}")
+    print(f"tiempo={elapsed:.2f}s reservas/s={bookings / elapsed:.0f}")
+    ok = statuses[200] == min(bookings, cupo) and booked == statuses[200] and booked <= cupo
+    print("OK: sin sobreventa" if ok else "FALLO: el cupo no se respetó")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=500)
+    parser.add_argument("--cupo", type=int, default=37)
+    parser.add_argument("--date", default="2099-01-01")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(main(args.bookings, args.cupo, args.date)) else 1)
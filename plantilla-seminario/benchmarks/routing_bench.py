@@ -0,0 +1,36 @@
+"""Microbenchmark de la tabla de despacho del API Gateway.
+
+Mide el coste medio de RouteTable.resolve() con tablas de distinto tamaño para
+comprobar que no crece con el número de servicios registrados.
+
+Uso:
+    python benchmarks/routing_bench.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api-gateway"))
+
+from routing import Route, RouteTable  # noqa: E402
+
+PATH = "experiences/experiences/652f1c2b9d1e8a0012345678"
+SERVICE_COUNTS = (4, 100, 1_000, 10_000)
+LOOKUPS = 200_000
+
+
+def build_table(n_services: int) -> RouteTable:
+    table = RouteTable()
+    table.add("experiences", Route(service_name="experiences", timeout=3.0))
+    for i in range(n_services - 1):
+        table.add(f"service{i}", Route(service_name=f"service{i}", timeout=3.0))
+    return table
+
+
+if __name__ == "__main__":
+    print(f"{'servicios':>10} {'ns/lookup':>10}")
+    for n in SERVICE_COUNTS:
+        table = build_table(n)
+        assert table.resolve(PATH)[0].service_name == "experiences"
+        best = min(timeit.repeat(lambda: table.resolve(PATH), number=LOOKUPS, repeat=5))
+        print(f"{n:>10} {best / LOOKUPS * 1e9:>10.0f}")
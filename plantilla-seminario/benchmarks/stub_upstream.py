@@ -0,0 +1,65 @@
+"""Upstream de prueba con latencia y fallos configurables.
+
+Sirve cualquier ruta GET/POST/PUT/DELETE con un JSON pequeño, y /api/v1/batch con
+el mismo formato que el gateway. Permite observar el comportamiento del API
+Gateway (reintentos, circuit breaker, hedging, caché) o del frontend sin levantar
+Mongo ni los microservicios reales.
+
+Variables de entorno:
+    STUB_DELAY_MS     latencia base de cada respuesta (por defecto 5)
+    STUB_SLOW_RATE    fracción de respuestas lentas (por defecto 0)
+    STUB_SLOW_MS      latencia de las respuestas lentas (por defecto 1000)
+    STUB_FAIL_RATE    fracción de respuestas 503 (por defecto 0)
+
+Uso (ej. simulando el servicio de valoraciones detrás del gateway):
+    STUB_SLOW_RATE=0.05 uvicorn stub_upstream:app --port 8005
+    cd api-gateway && PYTHONPATH=.. RATINGS_SERVICE_URL=http://localhost:8005 RATINGS_HEDGE=true \
+        uvicorn main:app --port 8000
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, HTTPException, Request
+
+app = FastAPI()
+
+DELAY = float(os.getenv("STUB_DELAY_MS", "5")) / 1000
+SLOW_RATE = float(os.getenv("STUB_SLOW_RATE", "0"))
+SLOW_DELAY = float(os.getenv("STUB_SLOW_MS", "1000")) / 1000
+FAIL_RATE = float(os.getenv("STUB_FAIL_RATE", "0"))
+
+hits = {"count": 0}
+
+
+@app.get("/stub/hits")
+def stub_hits():
+    return hits
+
+
+async def respond(path: str):
+    hits["count"] += 1
+    await asyncio.sleep(SLOW_DELAY if random.random() < SLOW_RATE else DELAY)
+    if random.random() < FAIL_RATE:
+        raise HTTPException(status_code=503, detail="stub failure")
+    return {"path": path, "experiences": [], "ratings": []}
+
+
+async def run_subrequest(sub: dict) -> dict:
+    try:
+        return {"id": sub.get("id"), "status": 200, "body": await respond(sub["path"].lstrip("/"))}
+    except HTTPException as e:
+        return {"id": sub.get("id"), "status": e.status_code, "body": {"detail": e.detail}}
+
+
+# Como el /api/v1/batch del gateway: las sub-peticiones se atienden en paralelo
+# y se devuelven todas juntas, cada una con su status y body.
+@app.post("/api/v1/batch")
+async def batch(request: Request):
+    subrequests = (await request.json()).get("requests", [])
+    return {"responses": await asyncio.gather(*[run_subrequest(sub) for sub in subrequests])}
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def any_path(path: str):
+    return await respond(path)
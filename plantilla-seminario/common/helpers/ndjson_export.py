@@ -0,0 +1,33 @@
+import json
+import zlib
+
+from fastapi.responses import StreamingResponse
+
+
+async def ndjson_export(cursor, serialize, batch_size: int, compress: bool):
+    """Emite los documentos del cursor como NDJSON, un bloque por lote, opcionalmente en gzip.
+
+    Solo hay un lote en memoria a la vez, así que el coste no depende del tamaño de la colección.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps(serialize(doc), default=str))
+        if len(lines) >= batch_size:
+            chunk = ("\n".join(lines) + "\n").encode()
+            lines = []
+            yield compressor.compress(chunk) if compressor else chunk
+    chunk = ("\n".join(lines) + "\n").encode() if lines else b""
+    if compressor:
+        yield compressor.compress(chunk) + compressor.flush()
+    elif chunk:
+        yield chunk
+
+
+def export_response(cursor, serialize, batch_size: int, compress: bool) -> StreamingResponse:
+    headers = {"Content-Encoding": "gzip"} if compress else {}
+    return StreamingResponse(
+        ndjson_export(cursor, serialize, batch_size, compress),
+        media_type="application/x-ndjson",
+        headers=headers,
+    )
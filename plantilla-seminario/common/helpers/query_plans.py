@@ -0,0 +1,17 @@
+def plan_summary(explain: dict) -> dict:
+    """Etapas del plan ganador de explain(), índices usados y si alguna etapa es un COLLSCAN."""
+    stages, indexes = [], []
+    plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+    pending = [plan]
+    while pending:
+        node = pending.pop()
+        # En find() con SBE el plan clásico queda bajo "queryPlan"
+        node = node.get("queryPlan", node)
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        pending.extend(node.get("inputStages", []))
+        if "inputStage" in node:
+            pending.append(node["inputStage"])
+    return {"stages": stages, "indexes": indexes, "collscan": "COLLSCAN" in stages}
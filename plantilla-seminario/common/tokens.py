@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class TokenError(Exception):
+    """Token mal formado, con firma inválida, de una clave desconocida o caducado."""
+
+
+def load_keys(spec: str) -> "OrderedDict[str, bytes]":
+    """Claves de firma desde "kid1:secreto1,kid2:secreto2".
+
+    La primera es la activa (firma los tokens nuevos); el resto solo se usan para
+    verificar, lo que permite rotar claves sin invalidar las sesiones abiertas.
+    """
+    keys = OrderedDict()
+    for item in spec.split(","):
+        kid, sep, secret = item.strip().partition(":")
+        if not sep or not kid or not secret:
+            raise ValueError(f"Clave de firma inválida: '{item}' (formato kid:secreto)")
+        keys[kid] = secret.encode()
+    if not keys:
+        raise ValueError("Se necesita al menos una clave de firma")
+    return keys
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenCodec:
+    """Emite y verifica tokens JWT firmados con HMAC-SHA256 (HS256), sin estado en servidor.
+
+    Los tokens ya verificados se guardan en una caché LRU hasta su expiración, así
+    que verificar un token repetido es una búsqueda en un dict.
+    """
+
+    def __init__(self, keys: Dict[str, bytes], ttl: int = 3600, cache_size: int = 10000):
+        self.keys = dict(keys)
+        self.active_kid = next(iter(keys))
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._verified: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def issue(self, subject: str, claims: Optional[dict] = None) -> str:
+        now = int(time.time())
+        header = {"alg": "HS256", "typ": "JWT", "kid": self.active_kid}
+        payload = {**(claims or {}), "sub": subject, "iat": now, "exp": now + self.ttl}
+        signing_input = (
+            _b64encode(json.dumps(header, separators=(",", ":")).encode())
+            + "."
+            + _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+        )
+        return signing_input + "." + _b64encode(self._sign(self.active_kid, signing_input))
+
+    def verify(self, token: str) -> dict:
+        """Devuelve los claims del token o lanza TokenError."""
+        claims = self._verified.get(token)
+        if claims is not None:
+            if claims["exp"] > time.time():
+                self._verified.move_to_end(token)
+                self.hits += 1
+                return claims
+            del self._verified[token]
+        self.misses += 1
+        try:
+            claims = self._decode(token)
+        except TokenError:
+            self.rejected += 1
+            raise
+        self._verified[token] = claims
+        while len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+        return claims
+
+    def stats(self) -> dict:
+        return {
+            "active_kid": self.active_kid,
+            "kids": list(self.keys),
+            "cached": len(self._verified),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+        }
+
+    def _sign(self, kid: str, signing_input: str) -> bytes:
+        return hmac.new(self.keys[kid], signing_input.encode(), hashlib.sha256).digest()
+
+    def _decode(self, token: str) -> dict:
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64decode(header_b64))
+            signature = _b64decode(signature_b64)
+        except ValueError:
+            raise TokenError("Token mal formado")
+        if not isinstance(header, dict):
+            raise TokenError("Token mal formado")
+        kid = header.get("kid")
+        if header.get("alg") != "HS256" or kid not in self.keys:
+            raise TokenError("Algoritmo o clave de firma no admitidos")
+        if not hmac.compare_digest(signature, self._sign(kid, f"{header_b64}.{payload_b64}")):
+            raise TokenError("Firma inválida")
+        try:
+            claims = json.loads(_b64decode(payload_b64))
+        except ValueError:
+            raise TokenError("Token mal formado")
+        if not isinstance(claims, dict):
+            raise TokenError("Token mal formado")
+        if not isinstance(claims.get("exp"), (int, float)) or claims["exp"] <= time.time():
+            raise TokenError("Token caducado")
+        return claims
@@ -2,6 +2,7 @@
 
 from flask import Flask, render_template, request, redirect, url_for, session, flash
 from flask_session import Session
+import gateway
 import os
 import requests
 
@@ -10,9 +11,14 @@ app.secret_key = os.getenv("SECRET_KEY", "supersecretkey")
 app.config["SESSION_TYPE"] = "filesystem"
 Session(app)
 
-# Obtén la URL del API Gateway desde las variables de entorno.
-# Esta variable debe estar configurada en el docker-compose.yml.
-API_GATEWAY_URL = os.getenv("API_GATEWAY_URL", "http://localhost:8000")
+@app.after_request
+def expire_session(response):
+    # El gateway rechazó el token (caducado o con una clave retirada): se pide un nuevo login
+    if gateway.session_expired():
+        session.clear()
+        flash("Tu sesión ha caducado. Inicia sesión de nuevo.", "info")
+        return redirect(url_for("login"))
+    return response
 
 @app.route("/")
 def index():
@@ -36,24 +42,22 @@ def guide_panel():
     if not guide:
         flash("No se pudo identificar al guía logueado.", "danger")
         return render_template("guide_panel.html", title="Panel de Guía", experiences=[])
-    consulta_url = f"{API_GATEWAY_URL}/api/v1/experiences/experiences?guide={guide}"
     experiences = []
     ratings = []
     try:
-        resp = requests.get(consulta_url, timeout=5)
-        data = resp.json()
-        experiences = data.get("experiences") or data
-        # Obtener IDs de experiencias del guía
-        exp_ids = [exp["id"] for exp in experiences if "id" in exp]
-        # Consultar todas las valoraciones
-        resp_ratings = requests.get(f"{API_GATEWAY_URL}/api/v1/ratings/ratings", timeout=5)
-        ratings_data = resp_ratings.json()
-        # Filtrar valoraciones solo de experiencias del guía
-        ratings = [r for r in ratings_data if r.get("experience_id") in exp_ids]
-        # Enriquecer con nombre de experiencia
-        exp_titles = {exp["id"]: exp.get("title", "") for exp in experiences}
-        for r in ratings:
-            r["experience_title"] = exp_titles.get(r["experience_id"], r["experience_id"])
+        # Experiencias del guía y sus valoraciones (ya con el título de la experiencia) en un solo viaje al gateway
+        exps_result, ratings_result = gateway.batch([
+            {"path": "/experiences/experiences", "query": {"guide": guide, "limit": gateway.PAGE_SIZE}},
+            {"path": f"/ratings/ratings/guide/{guide}", "query": {"limit": 200}},
+        ])
+        data = exps_result["body"]
+        experiences = data.get("experiences", [])
+        if data.get("next_cursor"):
+            # El resto de páginas, a partir de la que ya llegó en el batch
+            experiences += gateway.get_all(
+                "/experiences/experiences", params={"guide": guide}, cursor=data["next_cursor"], timeout=5
+            )
+        ratings = ratings_result["body"].get("ratings", [])
     except Exception:
         print("Error obteniendo experiencias o valoraciones del guía")
         flash("No se pudieron cargar las experiencias o valoraciones del guía.", "danger")
@@ -84,7 +88,7 @@ def new_item():
         }
         # Envía los datos al API Gateway para crear un nuevo recurso.
         try:
-            resp = requests.post(f"{API_GATEWAY_URL}/api/v1/experiences/experiences", json=item_data, timeout=10)
+            resp = gateway.post("/experiences/experiences", json=item_data, timeout=10)
             if resp.status_code in [200, 201]:
                 flash("Experiencia creada con éxito.", "success")
             else:
@@ -95,9 +99,7 @@ def new_item():
         # Recarga la lista de experiencias del guía
         guide = session.get("username")
         try:
-            resp = requests.get(f"{API_GATEWAY_URL}/api/v1/experiences/experiences?guide={guide}", timeout=5)
-            data = resp.json()
-            exps = data.get("experiences") or data
+            exps = gateway.get_all("/experiences/experiences", params={"guide": guide}, timeout=5)
         except requests.exceptions.RequestException as e:
             print(f"Error obteniendo experiencias: {e}")
             exps = []
@@ -117,13 +119,9 @@ def experiences():
             if not guide:
                 flash("No se pudo identificar al guía logueado.", "danger")
             else:
-                resp = requests.get(f"{API_GATEWAY_URL}/api/v1/experiences/experiences?guide={guide}", timeout=5)
-                data = resp.json()
-                exps = data.get("experiences") or data
+                exps = gateway.get_all("/experiences/experiences", params={"guide": guide}, timeout=5)
         else:
-            resp = requests.get(f"{API_GATEWAY_URL}/api/v1/experiences/experiences", timeout=5)
-            data = resp.json()
-            exps = data.get("experiences") or data
+            exps = gateway.get_all("/experiences/experiences", timeout=5)
             # Si es turista, filtrar solo las experiencias con cupo >= 1
             if role == "turista":
                 exps = [exp for exp in exps if (exp.get('cupo', 0) if isinstance(exp, dict) else getattr(exp, 'cupo', 0)) >= 1]
@@ -150,7 +148,7 @@ def reserve(exp_id):
             "num_personas": num_personas
         }
         try:
-            resp = requests.post(f"{API_GATEWAY_URL}/api/v1/reservations/reservations", json=reservation, timeout=5)
+            resp = gateway.post("/reservations/reservations", json=reservation, timeout=5)
             # Manejar errores 400 (por ejemplo, cupos insuficientes) con mensaje amigable
             if resp.status_code == 400:
                 try:
@@ -168,41 +166,36 @@ def reserve(exp_id):
         except requests.exceptions.RequestException as e:
             return render_template("message.html", title="Error", message=f"Error creando reserva: {e}")
 
-    return render_template("reserve.html", title="Reservar", exp_id=exp_id)
+    # La experiencia y sus plazas libres de los próximos días (para marcar las fechas sin cupo), en paralelo
+    exp_resp, availability_resp = gateway.fan_out(
+        ("GET", f"/experiences/experiences/{exp_id}", {}),
+        ("GET", "/reservations/availability", {"params": {"experience_ids": exp_id, "days": 60}}),
+    )
+    experience, availability = None, {}
+    try:
+        if isinstance(exp_resp, requests.Response) and exp_resp.ok:
+            experience = exp_resp.json().get("experience")
+        if isinstance(availability_resp, requests.Response) and availability_resp.ok:
+            availability = availability_resp.json()["experiences"][exp_id]["remaining"]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        pass  # Sin datos se muestra el formulario sin el resumen de plazas
+    return render_template("reserve.html", title="Reservar", exp_id=exp_id, experience=experience, availability=availability)
 
 
 @app.route("/experiences/<string:exp_id>/rate", methods=["GET", "POST"])
 def rate(exp_id):
-    # Check if user can rate: user must have a reservation for this experience
+    # Solo puede valorar quien tiene una reserva asistida de esta experiencia (una consulta por índice)
     can_rate = False
     username = session.get("username")
     if username:
         try:
-            resp_check = requests.get(f"{API_GATEWAY_URL}/api/v1/reservations/reservations?user_id={username}", timeout=5)
+            resp_check = gateway.get(
+                "/reservations/reservations/can-rate",
+                params={"user_id": username, "experience_id": exp_id},
+                timeout=5,
+            )
             resp_check.raise_for_status()
-            data_check = resp_check.json()
-            reservations_list = data_check.get("reservations") if isinstance(data_check, dict) and data_check.get("reservations") else data_check
-            # reservations_list expected to be a list of reservations with experience_id and date
-            from datetime import datetime
-            for r in reservations_list:
-                try:
-                    date_str = r.get("date")
-                    attended = r.get("attended", False)
-                    parsed = None
-                    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d"):
-                        try:
-                            parsed = datetime.strptime(date_str, fmt).date()
-                            break
-                        except Exception:
-                            continue
-                    if parsed:
-                        today = datetime.utcnow().date()
-                        # Permitir valorar solo si la reserva está marcada como vivida y la experiencia coincide
-                        if attended and str(r.get("experience_id")) == str(exp_id):
-                            can_rate = True
-                            break
-                except Exception:
-                    continue
+            can_rate = bool(resp_check.json().get("can_rate"))
         except Exception:
             can_rate = False
 
@@ -215,7 +208,7 @@ def rate(exp_id):
             "rating": int(request.form.get("rating", 5))
         }
         try:
-            resp = requests.post(f"{API_GATEWAY_URL}/api/v1/ratings/ratings", json=rating, timeout=5)
+            resp = gateway.post("/ratings/ratings", json=rating, timeout=5)
             resp.raise_for_status()
             return render_template("message.html", title="Valoración creada", message="Valoración creada correctamente.")
         except requests.exceptions.RequestException as e:
@@ -233,41 +226,10 @@ def my_reservations():
     username = session.get("username")
     reservations = []
     try:
-        resp = requests.get(f"{API_GATEWAY_URL}/api/v1/reservations/reservations?user_id={username}", timeout=5)
+        # Reservas ya enriquecidas con el título de la experiencia y si se pueden valorar
+        resp = gateway.get("/reservations/reservations/enriched", params={"user_id": username}, timeout=5)
         resp.raise_for_status()
-        data = resp.json()
-        reservations = data.get("reservations") if isinstance(data, dict) and data.get("reservations") else data
-        from datetime import datetime
-        enriched = []
-        for r in reservations:
-            exp_id = r.get("experience_id")
-            title = exp_id
-            # intentar obtener título de la experiencia
-            try:
-                resp_exp = requests.get(f"{API_GATEWAY_URL}/api/v1/experiences/experiences/{exp_id}", timeout=5)
-                if resp_exp.status_code == 200:
-                    exp_data = resp_exp.json().get("experience")
-                    if exp_data and exp_data.get("title"):
-                        title = exp_data.get("title")
-                    else:
-                        title = "Experiencia no disponible"
-                else:
-                    title = "Experiencia no disponible"
-            except Exception:
-                title = "Experiencia no disponible"
-
-            attended = bool(r.get("attended", False))
-
-            enriched.append({
-                "id": r.get("id") or r.get("_id"),
-                "experience_id": exp_id,
-                "title": title,
-                "date": r.get("date"),
-                "notes": r.get("notes", ""),
-                "attended": attended,
-                "can_rate": attended
-            })
-        reservations = enriched
+        reservations = resp.json()
     except requests.exceptions.RequestException as e:
         print(f"Error obteniendo reservas: {e}")
         flash("No se pudieron cargar las reservas.", "danger")
@@ -280,7 +242,7 @@ def confirm_attended(reservation_id):
         flash("Debes iniciar sesión para confirmar asistencia.", "danger")
         return redirect(url_for("login"))
     try:
-        resp = requests.post(f"{API_GATEWAY_URL}/api/v1/reservations/reservations/{reservation_id}/attend", timeout=5)
+        resp = gateway.post(f"/reservations/reservations/{reservation_id}/attend", timeout=5)
         if resp.status_code == 200:
             flash("Reserva marcada como 'vivida'. Ahora puedes valorar.", "success")
         else:
@@ -295,11 +257,21 @@ def login():
         username = request.form["username"]
         password = request.form["password"]
         try:
-            resp = requests.post(f"{API_GATEWAY_URL}/api/v1/auth/login", json={"username": username, "password": password}, timeout=5)
-            if resp.status_code == 200:
+            resp = gateway.post(
+                "/auth/login",
+                json={"username": username, "password": password},
+                headers={"X-Forwarded-For": request.remote_addr or ""},
+                timeout=5,
+                auth=False,
+            )
+            if resp.status_code == 429:
+                flash("Demasiados intentos. Espera unos minutos antes de volver a intentarlo.", "danger")
+            elif resp.status_code == 200:
                 data = resp.json()
                 session["username"] = username
                 session["role"] = data.get("role", "turista")
+                # Token firmado del servicio de autenticación; el gateway lo verifica sin consultar la base de datos
+                session["access_token"] = data.get("access_token")
                 flash("Bienvenido, {}!".format(username), "success")
                 return redirect(url_for("index"))
             else:
@@ -315,10 +287,11 @@ def register():
         password = request.form["password"]
         role = request.form["role"]
         try:
-            resp = requests.post(
-                f"{API_GATEWAY_URL}/api/v1/auth/register",
+            resp = gateway.post(
+                "/auth/register",
                 json={"username": username, "password": password, "role": role},
-                timeout=5
+                timeout=5,
+                auth=False,
             )
             if resp.status_code in [200, 201]:
                 flash("Registro exitoso. Ahora puedes iniciar sesión.", "success")
@@ -353,8 +326,8 @@ def new_experience():
                 cupo = int(float(cupo_raw)) if cupo_raw and float(cupo_raw) > 0 else 1
             except Exception:
                 cupo = 1
-            resp = requests.post(
-                f"{API_GATEWAY_URL}/api/v1/experiences/experiences",
+            resp = gateway.post(
+                "/experiences/experiences",
                 json={"title": title, "description": description, "price": float(price), "guide": guide, "cupo": cupo},
                 timeout=5
             )
@@ -375,13 +348,11 @@ def guide_experiences():
         return redirect(url_for("login"))
 
     try:
-        resp = requests.get(
-            f"{API_GATEWAY_URL}/api/v1/experiences?guide={session.get('username')}",
+        experiences = gateway.get_all(
+            "/experiences",
+            params={"guide": session.get("username")},
             timeout=5
         )
-        resp.raise_for_status()
-        data = resp.json()
-        experiences = data.get("experiences", [])
     except requests.exceptions.RequestException as e:
         flash(f"Error obteniendo experiencias: {e}", "danger")
         experiences = []
@@ -392,7 +363,7 @@ def guide_experiences():
 def edit_experience(exp_id):
     if request.method == "GET":
         try:
-            resp = requests.get(f"{API_GATEWAY_URL}/api/v1/experiences/experiences/{exp_id}", timeout=5)
+            resp = gateway.get(f"/experiences/experiences/{exp_id}", timeout=5)
             experience = resp.json().get("experience")
             if not experience:
                 flash("Experiencia no encontrada.", "danger")
@@ -408,15 +379,17 @@ def edit_experience(exp_id):
             return redirect(url_for("guide_panel"))
 
     if request.method == "POST":
-        # Preserve original guide when admin edits
+        # Preserve original guide when admin edits: se lee del servicio, nunca del formulario
         guide_owner = session.get("username")
         if session.get("role") == "admin":
             try:
-                existing = requests.get(f"{API_GATEWAY_URL}/api/v1/experiences/experiences/{exp_id}", timeout=5).json().get("experience")
-                if existing and existing.get("guide"):
-                    guide_owner = existing.get("guide")
+                existing = gateway.get(f"/experiences/experiences/{exp_id}", timeout=5).json().get("experience")
+                guide_owner = existing.get("guide") if existing else None
             except Exception:
-                guide_owner = session.get("username")
+                guide_owner = None
+            if not guide_owner:
+                flash("No se pudo obtener el guía de la experiencia.", "danger")
+                return redirect(url_for("admin_experiences"))
 
         cupo_raw = request.form.get("cupo")
         try:
@@ -431,7 +404,7 @@ def edit_experience(exp_id):
             "cupo": cupo
         }
         try:
-            resp = requests.put(f"{API_GATEWAY_URL}/api/v1/experiences/experiences/{exp_id}", json=updated_data, timeout=5)
+            resp = gateway.put(f"/experiences/experiences/{exp_id}", json=updated_data, timeout=5)
             if resp.status_code == 200:
                 flash("Experiencia actualizada con éxito.", "success")
             else:
@@ -446,7 +419,7 @@ def edit_experience(exp_id):
 @app.route("/experiences/<exp_id>/delete", methods=["POST"])
 def delete_experience(exp_id):
     try:
-        resp = requests.delete(f"{API_GATEWAY_URL}/api/v1/experiences/experiences/{exp_id}", timeout=5)
+        resp = gateway.delete(f"/experiences/experiences/{exp_id}", timeout=5)
         if resp.status_code == 200:
             flash("Experiencia eliminada con éxito.", "success")
         else:
@@ -465,9 +438,7 @@ def admin_experiences():
         return redirect(url_for("index"))
     exps = []
     try:
-        resp = requests.get(f"{API_GATEWAY_URL}/api/v1/experiences/experiences", timeout=5)
-        data = resp.json()
-        exps = data.get("experiences") or data
+        exps = gateway.get_all("/experiences/experiences", timeout=5)
     except requests.exceptions.RequestException as e:
         print(f"Error obteniendo experiencias: {e}")
         flash("No se pudieron cargar las experiencias.", "danger")
@@ -0,0 +1,140 @@
+# /frontend/gateway.py
+"""Cliente HTTP del frontend hacia el API Gateway.
+
+Todas las vistas comparten una `requests.Session` con pool de conexiones
+keep-alive, así que las llamadas no repiten el handshake TCP. `fan_out`
+ejecuta en paralelo llamadas independientes de una misma vista.
+
+Si el gateway rechaza el token de la sesión (401), la petición de Flask queda
+marcada y `session_expired()` lo indica para cerrar la sesión y pedir un nuevo login.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from flask import g, has_request_context, session
+import requests
+from requests.adapters import HTTPAdapter
+
+# Obtén la URL del API Gateway desde las variables de entorno.
+# Esta variable debe estar configurada en el docker-compose.yml.
+API_GATEWAY_URL = os.getenv("API_GATEWAY_URL", "http://localhost:8000")
+DEFAULT_TIMEOUT = float(os.getenv("GATEWAY_TIMEOUT", "5"))
+# Conexiones keep-alive al gateway (una por hilo de Flask o de fan_out en uso)
+POOL_SIZE = int(os.getenv("GATEWAY_POOL_SIZE", "32"))
+# Elementos por página que pide get_all a los listados paginados por cursor
+PAGE_SIZE = int(os.getenv("GATEWAY_PAGE_SIZE", "100"))
+
+http = requests.Session()
+http.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+http.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+
+# Hilos para las llamadas en paralelo de fan_out
+_fan_out_pool = ThreadPoolExecutor(max_workers=int(os.getenv("GATEWAY_FANOUT_WORKERS", "16")))
+
+
+def _auth_headers() -> dict:
+    # El token de la sesión se lee en el hilo de la petición de Flask, no en los de fan_out
+    token = session.get("access_token") if has_request_context() else None
+    return {"Authorization": f"Bearer {token}"} if token else {}
+
+
+def _mark_expired(status_code: int):
+    # Solo desde el hilo de la petición de Flask (fan_out lo comprueba al recoger los resultados)
+    if status_code == 401 and has_request_context():
+        g.gateway_session_expired = True
+
+
+def session_expired() -> bool:
+    """True si en esta petición el gateway rechazó el token de la sesión."""
+    return has_request_context() and g.get("gateway_session_expired", False)
+
+
+def _send(method: str, path: str, timeout: float, headers: dict, **kwargs) -> requests.Response:
+    return http.request(method, f"{API_GATEWAY_URL}/api/v1{path}", headers=headers, timeout=timeout, **kwargs)
+
+
+def call(method: str, path: str, timeout: float = DEFAULT_TIMEOUT, headers=None, auth: bool = True, **kwargs) -> requests.Response:
+    """Petición a /api/v1<path> del gateway, ej. call("GET", "/experiences/experiences").
+
+    Con auth=False no se envía el token de la sesión (login y registro).
+    """
+    if not auth:
+        return _send(method, path, timeout, headers or {}, **kwargs)
+    resp = _send(method, path, timeout, {**_auth_headers(), **(headers or {})}, **kwargs)
+    _mark_expired(resp.status_code)
+    return resp
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return call("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return call("POST", path, **kwargs)
+
+
+def put(path: str, **kwargs) -> requests.Response:
+    return call("PUT", path, **kwargs)
+
+
+def delete(path: str, **kwargs) -> requests.Response:
+    return call("DELETE", path, **kwargs)
+
+
+def get_all(path: str, key: str = "experiences", params=None, cursor=None, **kwargs) -> list:
+    """Recorre un listado paginado por cursor pidiendo páginas de PAGE_SIZE elementos.
+
+    Sigue `next_cursor` hasta la última página y devuelve los elementos de `key`
+    de todas ellas. Con `cursor` empieza por esa página (ej. la siguiente a una
+    que ya llegó por batch).
+    """
+    items = []
+    while True:
+        page_params = {**(params or {}), "limit": PAGE_SIZE}
+        if cursor:
+            page_params["cursor"] = cursor
+        resp = get(path, params=page_params, **kwargs)
+        resp.raise_for_status()
+        data = resp.json()
+        items.extend(data.get(key, []))
+        cursor = data.get("next_cursor")
+        if not cursor:
+            return items
+
+
+def fan_out(*calls):
+    """Lanza a la vez varias llamadas (method, path, kwargs) y devuelve sus resultados en orden.
+
+    Cada resultado es la `requests.Response` o la excepción que produjo la llamada,
+    para que la vista decida qué hacer con cada una por separado.
+    """
+    auth = _auth_headers()
+
+    def run(method, path, kwargs):
+        try:
+            timeout = kwargs.pop("timeout", DEFAULT_TIMEOUT)
+            return _send(method, path, timeout, {**auth, **kwargs.pop("headers", {})}, **kwargs)
+        except requests.exceptions.RequestException as e:
+            return e
+
+    futures = [_fan_out_pool.submit(run, method, path, dict(kwargs)) for method, path, kwargs in calls]
+    results = [future.result() for future in futures]
+    for result in results:
+        if isinstance(result, requests.Response):
+            _mark_expired(result.status_code)
+    return results
+
+
+def batch(subrequests, timeout: float = DEFAULT_TIMEOUT):
+    """Envía varias peticiones al gateway en una sola llamada a /api/v1/batch.
+
+    Cada sub-petición es un dict con "path" (ej. "/experiences/experiences") y,
+    opcionalmente, "method", "query" y "body". Devuelve la lista de resultados
+    ({"status", "body"}) en el mismo orden.
+    """
+    resp = post("/batch", json={"requests": subrequests}, timeout=timeout)
+    resp.raise_for_status()
+    responses = resp.json()["responses"]
+    for result in responses:
+        _mark_expired(result["status"])
+    return responses
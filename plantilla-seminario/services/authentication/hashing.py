@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+
+class HasherOverloaded(Exception):
+    """La cola de hashing está llena: la petición se rechaza sin calcular nada."""
+
+
+class PasswordHasher:
+    """bcrypt en un pool de hilos propio, con cola acotada.
+
+    bcrypt libera el GIL mientras calcula, así que `workers` hilos aprovechan
+    otros tantos núcleos sin ocupar el threadpool por defecto de FastAPI (el
+    que atiende /health y el resto de endpoints síncronos). Como mucho
+    `workers + max_queue` operaciones esperan o se ejecutan a la vez; a partir
+    de ahí se lanza HasherOverloaded para que el endpoint responda 429.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 2, max_queue: int = 32, window: int = 500):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self._context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self.rejected = 0
+        self._latencies = {"hash": deque(maxlen=window), "verify": deque(maxlen=window)}
+        self._waits = deque(maxlen=window)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", self._context.hash, password)
+
+    async def verify(self, password: str, hashed: Optional[str]) -> bool:
+        if not hashed:
+            return False
+        return await self._submit("verify", self._context.verify, password, hashed)
+
+    async def _submit(self, op: str, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HasherOverloaded()
+            self._pending += 1
+        queued_at = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                self._waits.append(started - queued_at)
+
+        try:
+            return await asyncio.wrap_future(self._executor.submit(run))
+        finally:
+            with self._lock:
+                self._pending -= 1
+            self._latencies[op].append(time.perf_counter() - queued_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending, running = self._pending, self._running
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "running": running,
+            "queued": pending - running,
+            "rejected": self.rejected,
+            "queue_wait": _percentiles(self._waits),
+            **{op: _percentiles(samples) for op, samples in self._latencies.items()},
+        }
+
+
+def _percentiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {"samples": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000, 2)
+
+    return {"samples": len(ordered), "p50_ms": pick(50), "p95_ms": pick(95), "p99_ms": pick(99)}
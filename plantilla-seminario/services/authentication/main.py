@@ -1,10 +1,17 @@
 # Ensure the required package is installed: passlib
 # If not installed, run: pip install passlib
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from pymongo import MongoClient
-from passlib.context import CryptContext
+from pymongo import MongoClient, ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from hashing import HasherOverloaded, PasswordHasher
+from common.helpers.query_plans import plan_summary
+from ratelimit import LoginLimiter, MemoryWindowStore, RedisWindowStore
+from common.tokens import TokenCodec, TokenError, load_keys
+from typing import Optional
+import logging
 import os
 
 app = FastAPI()
@@ -15,8 +22,56 @@ client = MongoClient(MONGO_URL)
 db = client.get_database()
 users_collection = db["users"]
 
-# Configuración de hash de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Índices que necesitan las consultas del servicio; se crean al arrancar si no existen.
+# El índice único sobre username además impide registrar dos veces el mismo usuario.
+INDEXES = [
+    IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+]
+
+# Consultas frecuentes cuyo plan se verifica en /diagnostics/query-plans
+HOT_QUERIES = {
+    "user_by_username": lambda: users_collection.find({"username": "__probe__"}),
+}
+
+# Hash de contraseñas: bcrypt con coste BCRYPT_ROUNDS en un pool propio de HASH_WORKERS hilos.
+# Con más de HASH_QUEUE_SIZE operaciones en espera, register/login responden 429.
+hasher = PasswordHasher(
+    rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+    workers=int(os.getenv("HASH_WORKERS", "2")),
+    max_queue=int(os.getenv("HASH_QUEUE_SIZE", "32")),
+)
+
+# Tokens de sesión firmados (HS256). AUTH_SIGNING_KEYS="kid:secreto,..." con la clave activa
+# primero; el gateway y los servicios que verifiquen tokens deben tener las mismas claves.
+tokens = TokenCodec(
+    load_keys(os.getenv("AUTH_SIGNING_KEYS", "default:supersecretkey")),
+    ttl=int(os.getenv("AUTH_TOKEN_TTL", "3600")),
+)
+
+# Límite de intentos fallidos de login por usuario y por IP en una ventana deslizante.
+# LOGIN_LIMIT_BACKEND=redis comparte los contadores entre réplicas (REDIS_URL).
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+if os.getenv("LOGIN_LIMIT_BACKEND", "memory") == "redis":
+    from common.database_redis import get_redis_client
+    login_store = RedisWindowStore(get_redis_client(), LOGIN_WINDOW_SECONDS)
+else:
+    login_store = MemoryWindowStore(LOGIN_WINDOW_SECONDS)
+login_limiter = LoginLimiter(
+    login_store,
+    max_per_user=int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", "5")),
+    max_per_ip=int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "20")),
+)
+# Proxies de confianza delante del servicio (frontend y gateway), que añaden la IP
+# del cliente a X-Forwarded-For.
+TRUSTED_PROXIES = int(os.getenv("LOGIN_TRUSTED_PROXIES", "2"))
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """IP del cliente original, saltando los proxies de confianza de X-Forwarded-For."""
+    chain = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+    chain.append(request.client.host if request.client else "")
+    return chain[max(0, len(chain) - 1 - TRUSTED_PROXIES)] or None
+
 
 class UserRegister(BaseModel):
     username: str
@@ -27,24 +82,98 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+@app.on_event("startup")
+def ensure_indexes():
+    try:
+        users_collection.create_indexes(INDEXES)
+    except OperationFailure as e:
+        # Por ejemplo, usuarios duplicados que impiden crear el índice único
+        logging.error("No se pudieron crear los índices de usuarios: %s", e)
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+
+@app.get("/diagnostics/query-plans")
+def query_plans():
+    return {name: plan_summary(query().explain()) for name, query in HOT_QUERIES.items()}
+
+async def hash_or_shed(operation, *args):
+    try:
+        return await operation(*args)
+    except HasherOverloaded:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiadas solicitudes de autenticación, inténtalo de nuevo",
+            headers={"Retry-After": "1"},
+        )
+
+
+@app.get("/metrics/hashing")
+def hashing_metrics():
+    return {**hasher.stats(), "login_blocked": login_limiter.blocked}
+
+
 @app.post("/register")
-def register(user: UserRegister):
-    if users_collection.find_one({"username": user.username}):
+async def register(user: UserRegister):
+    if await run_in_threadpool(users_collection.find_one, {"username": user.username}):
         raise HTTPException(status_code=400, detail="El usuario ya existe")
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await hash_or_shed(hasher.hash, user.password)
     user_dict = user.dict()
     user_dict["password"] = hashed_password
-    users_collection.insert_one(user_dict)
+    try:
+        await run_in_threadpool(users_collection.insert_one, user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="El usuario ya existe")
     return {"msg": "Usuario registrado", "user": user.username, "role": user.role}
 
 @app.post("/login")
-def login(user: UserLogin):
-    db_user = users_collection.find_one({"username": user.username})
-    if not db_user or not pwd_context.verify(user.password, db_user["password"]):
+async def login(user: UserLogin, request: Request):
+    ip = client_ip(request)
+    # El intento cuenta como fallido desde ya; se rechaza antes de tocar la base de datos o bcrypt
+    wait, marks = await run_in_threadpool(login_limiter.attempt, user.username, ip)
+    if wait is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Demasiados intentos fallidos, inténtalo más tarde",
+            headers={"Retry-After": str(int(wait) + 1)},
+        )
+    try:
+        db_user = await run_in_threadpool(users_collection.find_one, {"username": user.username})
+        valid = bool(db_user) and await hash_or_shed(hasher.verify, user.password, db_user["password"])
+    except BaseException:
+        # Sin verificar (cola de hashing llena, error de base de datos...): no cuenta como fallo
+        await run_in_threadpool(login_limiter.cancel, marks)
+        raise
+    if not valid:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
-    # Aquí deberías generar un JWT, por ahora solo devolvemos un mensaje
-    return {"msg": "Login exitoso", "user": user.username, "role": db_user.get("role", "turista")}
+    await run_in_threadpool(login_limiter.success, user.username, marks)
+    role = db_user.get("role", "turista")
+    return {
+        "msg": "Login exitoso",
+        "user": user.username,
+        "role": role,
+        "access_token": tokens.issue(user.username, {"role": role}),
+        "token_type": "bearer",
+        "expires_in": tokens.ttl,
+    }
+
+
+@app.get("/verify")
+def verify(authorization: Optional[str] = Header(None)):
+    """Valida un token Bearer sin consultar la base de datos y devuelve su usuario y rol."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Token requerido")
+    try:
+        claims = tokens.verify(token)
+    except TokenError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    return {"user": claims["sub"], "role": claims.get("role"), "exp": claims["exp"]}
+
+
+@app.get("/tokens/stats")
+def token_stats():
+    return tokens.stats()
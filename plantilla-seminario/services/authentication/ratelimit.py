@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import List, Optional, Tuple
+
+
+class MemoryWindowStore:
+    """Marcas de tiempo recientes por clave, en memoria del proceso (un contador por réplica)."""
+
+    def __init__(self, window: float, max_keys: int = 100000):
+        self.window = window
+        self.max_keys = max_keys
+        self._events: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def recent(self, key: str) -> List[float]:
+        with self._lock:
+            events = self._events.get(key)
+            if events is None:
+                return []
+            cutoff = time.time() - self.window
+            while events and events[0] <= cutoff:
+                events.popleft()
+            if not events:
+                del self._events[key]
+                return []
+            return list(events)
+
+    def add(self, key: str) -> float:
+        """Añade un evento y devuelve su marca, para poder retirarlo con discard()."""
+        now = time.time()
+        with self._lock:
+            self._events.setdefault(key, deque()).append(now)
+            self._events.move_to_end(key)
+            while len(self._events) > self.max_keys:
+                self._events.popitem(last=False)
+        return now
+
+    def discard(self, key: str, mark: float) -> None:
+        with self._lock:
+            events = self._events.get(key)
+            if events is not None and mark in events:
+                events.remove(mark)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._events.pop(key, None)
+
+
+class RedisWindowStore:
+    """Misma ventana sobre un sorted set de Redis, compartida por todas las réplicas del servicio."""
+
+    def __init__(self, client, window: float, prefix: str = "login-limit:"):
+        self.client = client
+        self.window = window
+        self.prefix = prefix
+
+    def recent(self, key: str) -> List[float]:
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(self.prefix + key, 0, now - self.window)
+        pipe.zrange(self.prefix + key, 0, -1, withscores=True)
+        _, members = pipe.execute()
+        return [score for _, score in members]
+
+    def add(self, key: str) -> str:
+        now = time.time()
+        mark = f"{now}:{uuid.uuid4().hex[:8]}"
+        pipe = self.client.pipeline()
+        pipe.zadd(self.prefix + key, {mark: now})
+        pipe.expire(self.prefix + key, int(self.window) + 1)
+        pipe.execute()
+        return mark
+
+    def discard(self, key: str, mark: str) -> None:
+        self.client.zrem(self.prefix + key, mark)
+
+    def reset(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+
+class LoginLimiter:
+    """Ventana deslizante de intentos fallidos de login por usuario y por IP.
+
+    El intento se cuenta como fallido antes de verificar la contraseña y se
+    retira si resulta correcto (o no llega a verificarse). Así una ráfaga de
+    intentos concurrentes ya ve los anteriores en curso, y los que superan el
+    máximo se rechazan sin hacer hashing.
+    """
+
+    def __init__(self, store, max_per_user: int = 5, max_per_ip: int = 20):
+        self.store = store
+        self.max_per_user = max_per_user
+        self.max_per_ip = max_per_ip
+        self.blocked = 0
+
+    def attempt(self, username: str, ip: Optional[str]) -> Tuple[Optional[float], list]:
+        """Registra el intento y devuelve (segundos hasta poder reintentar o None, marcas del intento).
+
+        Si hay que esperar, el intento ya se ha retirado; si no, las marcas se
+        pasan a success() o cancel() cuando se conozca el resultado.
+        """
+        limits = [(f"user:{username}", self.max_per_user)]
+        if ip:
+            limits.append((f"ip:{ip}", self.max_per_ip))
+        marks = [(key, self.store.add(key)) for key, _ in limits]
+        waits = [self._wait(key, limit) for key, limit in limits]
+        waits = [w for w in waits if w is not None]
+        if not waits:
+            return None, marks
+        self.blocked += 1
+        self.cancel(marks)
+        return max(waits), []
+
+    def success(self, username: str, marks: list) -> None:
+        self.store.reset(f"user:{username}")
+        self.cancel(marks)
+
+    def cancel(self, marks: list) -> None:
+        """Retira un intento que no llegó a fallar (correcto o sin verificar)."""
+        for key, mark in marks:
+            self.store.discard(key, mark)
+
+    def _wait(self, key: str, limit: int) -> Optional[float]:
+        # Incluye el intento actual: se admite mientras haya como mucho `limit` en la ventana
+        events = self.store.recent(key)
+        if len(events) <= limit:
+            return None
+        # Se libera un hueco cuando sale de la ventana el fallo que completó el límite
+        return max(0.0, events[-limit - 1] + self.store.window - time.time())
@@ -1,7 +1,11 @@
-from fastapi import FastAPI
-from models import Experience
-from pymongo import MongoClient
+from fastapi import BackgroundTasks, FastAPI, HTTPException
+from models import Experience, ExperienceLookup
+from pymongo import MongoClient, ASCENDING, DESCENDING, IndexModel
+from common.helpers.query_plans import plan_summary
+import base64
+import json
 import os
+import urllib.request
 from bson.objectid import ObjectId
 
 app = FastAPI()
@@ -12,7 +16,31 @@ client = MongoClient(DATABASE_URL)
 db = client["experiences_db"]
 experiences_collection = db["experiences"]
 
+# El servicio de reservas cachea el cupo de cada experiencia; se le avisa al modificarla.
+RESERVATIONS_SERVICE_URL = os.getenv("RESERVATIONS_SERVICE_URL", "http://reservations-service:8004")
 
+# Índices para los listados paginados (filtro por guía y orden por fecha de creación o precio).
+# Las búsquedas por id ($in sobre _id) usan el índice por defecto de _id.
+INDEXES = [
+    IndexModel([("guide", ASCENDING), ("_id", ASCENDING)], name="guide_created"),
+    IndexModel([("price", ASCENDING), ("_id", ASCENDING)], name="price"),
+    IndexModel([("guide", ASCENDING), ("price", ASCENDING), ("_id", ASCENDING)], name="guide_price"),
+]
+
+# Consultas frecuentes cuyo plan se verifica en /diagnostics/query-plans
+HOT_QUERIES = {
+    "list_by_guide": lambda: experiences_collection.find({"guide": "__probe__"}).sort([("_id", ASCENDING)]),
+    "list_by_price": lambda: experiences_collection.find({}).sort([("price", ASCENDING), ("_id", ASCENDING)]),
+    "list_by_guide_and_price": lambda: experiences_collection.find({"guide": "__probe__"}).sort(
+        [("price", ASCENDING), ("_id", ASCENDING)]
+    ),
+    "lookup_by_ids": lambda: experiences_collection.find({"_id": {"$in": [ObjectId()]}}),
+}
+
+
+@app.on_event("startup")
+def ensure_indexes():
+    experiences_collection.create_indexes(INDEXES)
 
 
 @app.get("/")
@@ -25,17 +53,128 @@ def health():
     return {"status": "ok"}
 
 
-@app.get("/experiences")
-def list_experiences(guide: str = None):
-    if guide:
-        experiences = list(experiences_collection.find({"guide": guide}))
-    else:
-        experiences = list(experiences_collection.find({}))
-    # Convertir _id a id (string) en cada experiencia
+@app.get("/diagnostics/query-plans")
+def query_plans():
+    return {name: plan_summary(query().explain()) for name, query in HOT_QUERIES.items()}
+
+
+# Máximo de ids que se pueden resolver en una sola consulta por lote
+MAX_LOOKUP_IDS = int(os.getenv("MAX_LOOKUP_IDS", "500"))
+
+
+def _projection(fields):
+    """Proyección de Mongo para los campos pedidos; None devuelve el documento completo."""
+    if not fields:
+        return None
+    return {field: 1 for field in fields}
+
+
+def lookup_experiences(ids, fields=None):
+    """Resuelve muchas experiencias por id con una sola consulta $in."""
+    if len(ids) > MAX_LOOKUP_IDS:
+        raise HTTPException(status_code=400, detail=f"Se admiten como máximo {MAX_LOOKUP_IDS} ids por consulta")
+    object_ids = [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+    experiences = list(experiences_collection.find({"_id": {"$in": object_ids}}, _projection(fields)))
     for exp in experiences:
         exp["id"] = str(exp["_id"])
         del exp["_id"]
-    return {"experiences": experiences}
+    found = {exp["id"] for exp in experiences}
+    return {"experiences": experiences, "missing": [i for i in ids if i not in found]}
+
+
+# Tamaño de página por defecto y máximo de los listados paginados
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Ordenaciones admitidas: campo de Mongo que la define ("created" es el orden de _id,
+# que incluye la fecha de creación). El prefijo "-" invierte el orden.
+SORT_FIELDS = {"created": "_id", "price": "price"}
+
+
+def encode_cursor(exp: dict, sort_field: str) -> str:
+    """Token opaco con la posición del último elemento de la página."""
+    position = {"id": str(exp["_id"])}
+    if sort_field != "_id":
+        position["value"] = exp.get(sort_field)
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        position["id"] = ObjectId(position["id"])
+        return position
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def cursor_filter(position: dict, sort_field: str, direction: int) -> dict:
+    """Filtro keyset: documentos estrictamente posteriores al cursor en el orden (sort_field, _id)."""
+    op = "$gt" if direction == ASCENDING else "$lt"
+    if sort_field == "_id":
+        return {"_id": {op: position["id"]}}
+    return {"$or": [
+        {sort_field: {op: position["value"]}},
+        {sort_field: position["value"], "_id": {op: position["id"]}},
+    ]}
+
+
+@app.get("/experiences")
+def list_experiences(
+    guide: str = None,
+    ids: str = None,
+    fields: str = None,
+    sort: str = "created",
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+):
+    """Listado paginado por cursor (keyset sobre el campo de orden y _id).
+
+    Devuelve como máximo `limit` experiencias (nunca más de MAX_PAGE_SIZE) y
+    `next_cursor` para pedir la página siguiente (None si no hay más).
+    Ej.: ?sort=-price&limit=20&fields=title,price
+    """
+    projection_fields = fields.split(",") if fields else None
+    if ids is not None:
+        # Varias experiencias por id (separados por coma), ej. ?ids=a,b,c&fields=title,cupo
+        return lookup_experiences([i for i in ids.split(",") if i], projection_fields)
+
+    direction = DESCENDING if sort.startswith("-") else ASCENDING
+    sort_field = SORT_FIELDS.get(sort.lstrip("-"))
+    if sort_field is None:
+        raise HTTPException(status_code=400, detail=f"Orden no soportado. Opciones: {', '.join(SORT_FIELDS)}")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    query = {"guide": guide} if guide else {}
+    if cursor:
+        query = {"$and": [query, cursor_filter(decode_cursor(cursor), sort_field, direction)]}
+    projection = _projection(projection_fields)
+    # El campo de orden es necesario para construir el cursor aunque no se haya pedido
+    drop_sort_field = projection is not None and sort_field != "_id" and sort_field not in projection
+    if drop_sort_field:
+        projection[sort_field] = 1
+
+    # Se pide un elemento de más solo para saber si existe una página siguiente
+    docs = experiences_collection.find(query, projection).sort([(sort_field, direction), ("_id", direction)]).limit(limit + 1)
+    experiences = []
+    next_cursor = None
+    for exp in docs:
+        if len(experiences) == limit:
+            next_cursor = encode_cursor(last, sort_field)
+            break
+        last = dict(exp)
+        # Convertir _id a id (string) en cada experiencia
+        exp["id"] = str(exp.pop("_id"))
+        if drop_sort_field:
+            exp.pop(sort_field, None)
+        experiences.append(exp)
+    return {"experiences": experiences, "next_cursor": next_cursor}
+
+
+@app.post("/experiences/lookup")
+def lookup_experiences_post(lookup: ExperienceLookup):
+    """Equivalente POST de ?ids= para listas de ids que no caben en la URL."""
+    return lookup_experiences(lookup.ids, lookup.fields)
 
 
 @app.post("/experiences")
@@ -54,20 +193,31 @@ def get_experience(exp_id: str):
     return {"error": "Experiencia no encontrada"}, 404
 
 
+def notify_experience_changed(exp_id: str):
+    """Invalida la experiencia en la caché del servicio de reservas (mejor esfuerzo)."""
+    url = f"{RESERVATIONS_SERVICE_URL}/cache/experiences/{exp_id}/invalidate"
+    try:
+        urllib.request.urlopen(urllib.request.Request(url, method="POST"), timeout=1).close()
+    except Exception:
+        pass  # La entrada caducará igualmente por TTL
+
+
 @app.put("/experiences/{exp_id}")
-def update_experience(exp_id: str, exp: Experience):
+def update_experience(exp_id: str, exp: Experience, background_tasks: BackgroundTasks):
     result = experiences_collection.update_one(
         {"_id": ObjectId(exp_id)},
         {"$set": exp.dict()}
     )
     if result.modified_count:
+        background_tasks.add_task(notify_experience_changed, exp_id)
         return {"msg": "Experiencia actualizada", "experience": exp.dict()}
     return {"error": "No se pudo actualizar la experiencia"}, 404
 
 
 @app.delete("/experiences/{exp_id}")
-def delete_experience(exp_id: str):
+def delete_experience(exp_id: str, background_tasks: BackgroundTasks):
     result = experiences_collection.delete_one({"_id": ObjectId(exp_id)})
     if result.deleted_count:
+        background_tasks.add_task(notify_experience_changed, exp_id)
         return {"msg": "Experiencia eliminada"}
     return {"error": "No se pudo eliminar la experiencia"}, 404
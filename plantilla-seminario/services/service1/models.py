@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List, Optional
 
 class Experience(BaseModel):
     title: str
@@ -6,3 +7,8 @@ class Experience(BaseModel):
     price: float
     guide: str  # Campo obligatorio para identificar al creador
     cupo: int   # Cupo máximo de asistentes
+
+
+class ExperienceLookup(BaseModel):
+    ids: List[str]
+    fields: Optional[List[str]] = None  # Campos a devolver; por defecto, todos
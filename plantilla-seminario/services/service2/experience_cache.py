@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class ExperienceCache:
+    """Caché local (read-through) de las experiencias: cupo y metadatos.
+
+    Una entrada es fresca durante `ttl` segundos. Después, y hasta `stale_ttl`,
+    se sigue sirviendo mientras se refresca en segundo plano, de modo que una
+    reserva solo espera al servicio de experiencias cuando la experiencia no
+    está en caché. El tamaño está acotado a `max_entries` (LRU).
+
+    Las cargas concurrentes de una misma experiencia se agrupan en una sola
+    petición (como el SingleFlight del gateway): varias reservas simultáneas
+    de una experiencia que no está en caché esperan la misma respuesta.
+    """
+
+    def __init__(
+        self,
+        load_one: Callable[[str], Awaitable[Optional[dict]]],
+        load_many: Callable[[List[str]], Awaitable[Dict[str, dict]]],
+        ttl: float = 30,
+        stale_ttl: float = 300,
+        max_entries: int = 10000,
+    ):
+        self._load_one = load_one
+        self._load_many = load_many
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (experiencia, guardada_en)
+        self._inflight: Dict[str, asyncio.Future] = {}  # id -> carga en curso
+        self._generation = 0  # cambia con cada invalidación
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.shared_loads = 0
+
+    async def get(self, exp_id: str) -> Optional[dict]:
+        experience = self._lookup(exp_id)
+        if experience is not None:
+            return experience
+        self.misses += 1
+        return await asyncio.shield(self._load(exp_id))
+
+    async def get_many(self, exp_ids: List[str]) -> Dict[str, dict]:
+        """Devuelve las experiencias en caché y carga las que faltan con una sola petición."""
+        found, missing = {}, []
+        for exp_id in exp_ids:
+            experience = self._lookup(exp_id)
+            if experience is not None:
+                found[exp_id] = experience
+            else:
+                missing.append(exp_id)
+        if missing:
+            self.misses += len(missing)
+            loaded = await self._load_many(missing)
+            for exp_id, experience in loaded.items():
+                self._store(exp_id, experience)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, exp_id: Optional[str] = None) -> int:
+        """Olvida una experiencia (o todas si no se indica id). Devuelve cuántas entradas se eliminaron."""
+        if exp_id is None:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            removed = 1 if self._entries.pop(exp_id, None) is not None else 0
+            self._inflight.pop(exp_id, None)
+        # Lo que se esté cargando ahora puede ser la versión anterior: no se guarda
+        self._generation += 1
+        self.invalidations += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "in_flight": len(self._inflight),
+            "shared_loads": self.shared_loads,
+        }
+
+    def _lookup(self, exp_id: str) -> Optional[dict]:
+        entry = self._entries.get(exp_id)
+        if entry is None:
+            return None
+        experience, stored_at = entry
+        age = time.monotonic() - stored_at
+        if age > self.stale_ttl:
+            del self._entries[exp_id]
+            return None
+        self._entries.move_to_end(exp_id)
+        if age > self.ttl:
+            self.stale_hits += 1
+            if exp_id not in self._inflight:
+                self._load(exp_id)
+        else:
+            self.hits += 1
+        return experience
+
+    def _load(self, exp_id: str) -> asyncio.Future:
+        """Carga la experiencia en su propia tarea, o devuelve la carga que ya está en curso."""
+        task = self._inflight.get(exp_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(exp_id, self._generation))
+            self._inflight[exp_id] = task
+            task.add_done_callback(lambda t: self._finish(exp_id, t))
+        else:
+            self.shared_loads += 1
+        return task
+
+    async def _fetch(self, exp_id: str, generation: int) -> Optional[dict]:
+        experience = await self._load_one(exp_id)
+        if experience is not None and generation == self._generation:
+            self._store(exp_id, experience)
+        return experience
+
+    def _finish(self, exp_id: str, task: asyncio.Future) -> None:
+        if self._inflight.get(exp_id) is task:
+            del self._inflight[exp_id]
+        # Un refresco en segundo plano que falla no tiene quien lo espere: se sigue
+        # sirviendo la copia anterior hasta que caduque.
+        if not task.cancelled():
+            task.exception()
+
+    def _store(self, exp_id: str, experience: dict) -> None:
+        self._entries[exp_id] = (experience, time.monotonic())
+        self._entries.move_to_end(exp_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
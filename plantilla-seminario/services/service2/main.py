@@ -1,19 +1,59 @@
 from fastapi import FastAPI, HTTPException
-import requests
+import httpx
 from pydantic import BaseModel
 from typing import List, Optional
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson.objectid import ObjectId
-from datetime import datetime
+from datetime import datetime, timedelta
+from experience_cache import ExperienceCache
+from common.helpers.ndjson_export import export_response
+from common.helpers.query_plans import plan_summary
 import os
 
 app = FastAPI()
 
 # Configuración de MongoDB
 DATABASE_URL = os.getenv("DATABASE_URL", "mongodb://reservations-db:27017/reservations_db")
-client = MongoClient(DATABASE_URL)
+client = AsyncIOMotorClient(DATABASE_URL, maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")))
 db = client["reservations_db"]
 reservations_collection = db["reservations"]
+# Cupos libres por (experiencia, fecha): un documento por par, actualizado de forma atómica
+capacity_collection = db["capacity"]
+
+# Índices para las consultas frecuentes: cupo ocupado por (experiencia, fecha)
+# y reservas de un usuario.
+INDEXES = [
+    IndexModel([("experience_id", ASCENDING), ("date", ASCENDING)], name="experience_date"),
+    IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_date"),
+    IndexModel(
+        [("user_id", ASCENDING), ("experience_id", ASCENDING), ("attended", ASCENDING)],
+        name="user_experience_attended",
+    ),
+]
+CAPACITY_INDEXES = [
+    IndexModel([("experience_id", ASCENDING), ("date", ASCENDING)], unique=True, name="experience_date_unique"),
+]
+
+# Servicio de experiencias: un único cliente HTTP con conexiones keep-alive,
+# creado al arrancar y compartido por todas las peticiones.
+EXPERIENCES_URL = os.getenv("EXPERIENCES_SERVICE_URL", "http://experiences-service:8002")
+experiences_client: Optional[httpx.AsyncClient] = None
+
+# Consultas frecuentes cuyo plan se verifica en /diagnostics/query-plans
+HOT_QUERIES = {
+    "reservations_by_experience_and_date": lambda: reservations_collection.find(
+        {"experience_id": "__probe__", "date": "2000-01-01"}
+    ),
+    "reservations_by_user": lambda: reservations_collection.find({"user_id": "__probe__"}),
+    "can_rate": lambda: reservations_collection.find(
+        {"user_id": "__probe__", "experience_id": "__probe__", "attended": True}, {"_id": 1}
+    ).limit(1),
+    "availability_range": lambda: capacity_collection.find(
+        {"experience_id": {"$in": ["__probe__"]}, "date": {"$gte": "2000-01-01", "$lte": "2000-12-31"}}
+    ),
+}
 
 class Reservation(BaseModel):
     id: Optional[str] = None
@@ -24,20 +64,81 @@ class Reservation(BaseModel):
     attended: bool = False
     num_personas: int = 1
 
+
+class BulkReservations(BaseModel):
+    reservations: List[Reservation]
+
+
+class BulkAttendance(BaseModel):
+    ids: List[str]
+
+
+# Máximo de elementos por petición en los endpoints masivos
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "500"))
+# Límites de /availability
+AVAILABILITY_MAX_DAYS = int(os.getenv("AVAILABILITY_MAX_DAYS", "366"))
+AVAILABILITY_MAX_EXPERIENCES = int(os.getenv("AVAILABILITY_MAX_EXPERIENCES", "50"))
+# Documentos por lote en /reservations/export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
 @app.get("/")
 def root():
     return {"message": "Servicio de reservas en funcionamiento."}
 
+@app.on_event("startup")
+async def startup():
+    global experiences_client
+    experiences_client = httpx.AsyncClient(
+        base_url=EXPERIENCES_URL,
+        timeout=5,
+        limits=httpx.Limits(max_connections=int(os.getenv("EXPERIENCES_MAX_CONNECTIONS", "100"))),
+    )
+    await reservations_collection.create_indexes(INDEXES)
+    await capacity_collection.create_indexes(CAPACITY_INDEXES)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await experiences_client.aclose()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+
+@app.get("/diagnostics/query-plans")
+async def query_plans():
+    return {name: plan_summary(await query().explain()) for name, query in HOT_QUERIES.items()}
+
+
+def export_helper(reservation) -> dict:
+    reservation["id"] = str(reservation.pop("_id"))
+    return reservation
+
+
+@app.get("/reservations/export")
+async def export_reservations(since: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE, gzip: bool = False):
+    """Exporta las reservas en NDJSON por orden de _id, leyendo del cursor por lotes.
+
+    Para reanudar una exportación se pasa en `since` el último id recibido.
+    """
+    query = {}
+    if since:
+        if not ObjectId.is_valid(since):
+            raise HTTPException(status_code=400, detail="'since' debe ser un id de reserva")
+        query["_id"] = {"$gt": ObjectId(since)}
+    batch_size = max(1, min(batch_size, EXPORT_BATCH_SIZE))
+    cursor = reservations_collection.find(query).sort("_id", ASCENDING).batch_size(batch_size)
+    return export_response(cursor, export_helper, batch_size, gzip)
+
+
 @app.get("/reservations")
-def list_reservations(user_id: Optional[str] = None):
+async def list_reservations(user_id: Optional[str] = None):
     query = {}
     if user_id:
         query["user_id"] = user_id
-    docs = list(reservations_collection.find(query))
+    docs = await reservations_collection.find(query).to_list(None)
     results = []
     for d in docs:
         d["id"] = str(d["_id"])
@@ -45,8 +146,160 @@ def list_reservations(user_id: Optional[str] = None):
         results.append(d)
     return results
 
-@app.post("/reservations")
-def create_reservation(res: Reservation):
+async def fetch_experiences(exp_ids) -> dict:
+    """Obtiene las experiencias indicadas con una sola petición al servicio de experiencias."""
+    if not exp_ids:
+        return {}
+    try:
+        resp = await experiences_client.get("/experiences", params={"ids": ",".join(exp_ids)})
+        resp.raise_for_status()
+        return {exp["id"]: exp for exp in resp.json().get("experiences", [])}
+    except Exception:
+        return {}
+
+
+async def fetch_experience(experience_id: str) -> Optional[dict]:
+    """Experiencia por id; None si no existe y 503 si el servicio de experiencias no responde."""
+    if not ObjectId.is_valid(experience_id):
+        return None
+    try:
+        resp = await experiences_client.get(f"/experiences/{experience_id}")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=503, detail="Servicio de experiencias no disponible")
+    if resp.status_code == 404:
+        return None
+    if resp.status_code >= 400:
+        raise HTTPException(status_code=503, detail="Servicio de experiencias no disponible")
+    body = resp.json()
+    return body.get("experience") if isinstance(body, dict) else None
+
+
+# Experiencias (cupo, título, ...) cacheadas en el proceso: validar una reserva no
+# necesita llamar al servicio de experiencias salvo la primera vez. El servicio de
+# experiencias avisa en /cache/experiences/{exp_id}/invalidate cuando una cambia.
+experience_cache = ExperienceCache(
+    fetch_experience,
+    fetch_experiences,
+    ttl=float(os.getenv("EXPERIENCE_CACHE_TTL", "30")),
+    stale_ttl=float(os.getenv("EXPERIENCE_CACHE_STALE_TTL", "300")),
+    max_entries=int(os.getenv("EXPERIENCE_CACHE_MAX_ENTRIES", "10000")),
+)
+
+
+@app.get("/cache/experiences")
+def experience_cache_stats():
+    return experience_cache.stats()
+
+
+@app.post("/cache/experiences/invalidate")
+def invalidate_all_experiences():
+    return {"invalidated": experience_cache.invalidate()}
+
+
+@app.post("/cache/experiences/{exp_id}/invalidate")
+def invalidate_experience(exp_id: str):
+    return {"invalidated": experience_cache.invalidate(exp_id)}
+
+
+@app.get("/reservations/enriched")
+async def list_reservations_enriched(user_id: str):
+    """Reservas del usuario con el título de cada experiencia y si ya puede valorarla."""
+    reservations = await reservations_collection.find({"user_id": user_id}).to_list(None)
+    experiences = await experience_cache.get_many(list({r["experience_id"] for r in reservations}))
+    results = []
+    for r in reservations:
+        exp = experiences.get(r["experience_id"])
+        attended = bool(r.get("attended", False))
+        results.append({
+            "id": str(r["_id"]),
+            "experience_id": r["experience_id"],
+            "title": exp.get("title") if exp and exp.get("title") else "Experiencia no disponible",
+            "date": r.get("date"),
+            "notes": r.get("notes", ""),
+            "num_personas": r.get("num_personas", 1),
+            "attended": attended,
+            "can_rate": attended,
+        })
+    return results
+
+@app.get("/reservations/can-rate")
+async def can_rate(user_id: str, experience_id: str):
+    """Indica si el usuario tiene una reserva asistida de la experiencia (requisito para valorarla)."""
+    reservation = await reservations_collection.find_one(
+        {"user_id": user_id, "experience_id": experience_id, "attended": True}, {"_id": 1}
+    )
+    return {"user_id": user_id, "experience_id": experience_id, "can_rate": reservation is not None}
+
+
+def experience_cupo(experience: dict) -> int:
+    """Cupo (plazas por fecha) de una experiencia; nunca se inventa uno por defecto."""
+    try:
+        cupo = int(experience["cupo"])
+    except (KeyError, TypeError, ValueError):
+        cupo = 0
+    if cupo < 1:
+        raise HTTPException(status_code=409, detail="La experiencia no tiene un cupo válido")
+    return cupo
+
+
+async def fetch_cupo(experience_id: str) -> int:
+    """Cupo de la experiencia, leído de la caché local de experiencias.
+
+    404 si la experiencia no existe y 503 si no se puede consultar: sin cupo
+    real no se reserva ni se crea el registro de cupos.
+    """
+    exp_data = await experience_cache.get(experience_id)
+    if exp_data is None:
+        raise HTTPException(status_code=404, detail="Experiencia no encontrada")
+    return experience_cupo(exp_data)
+
+
+async def ensure_ledger(experience_id: str, date_str: str, cupo: int):
+    """Crea el documento de cupos de (experiencia, fecha) si no existe y lo alinea con el cupo actual."""
+    key = {"experience_id": experience_id, "date": date_str}
+    ledger = await capacity_collection.find_one(key)
+    if ledger is None:
+        # Solo la primera vez: descuenta las reservas que ya existían para esa fecha
+        booked = 0
+        async for r in reservations_collection.find(key, {"num_personas": 1}):
+            booked += int(r.get("num_personas", 1))
+        try:
+            await capacity_collection.insert_one({**key, "capacity": cupo, "remaining": cupo - booked})
+        except DuplicateKeyError:
+            pass  # Otra reserva concurrente lo acaba de crear
+        return
+    if ledger["capacity"] != cupo:
+        # El guía cambió el cupo: la diferencia se suma (o resta) a las plazas libres
+        await capacity_collection.update_one(
+            {**key, "capacity": ledger["capacity"]},
+            {"$set": {"capacity": cupo}, "$inc": {"remaining": cupo - ledger["capacity"]}},
+        )
+
+
+async def reserve_seats(experience_id: str, date_str: str, seats: int) -> bool:
+    """Descuenta plazas con una única actualización condicional: nunca deja el cupo en negativo."""
+    ledger = await capacity_collection.find_one_and_update(
+        {"experience_id": experience_id, "date": date_str, "remaining": {"$gte": seats}},
+        {"$inc": {"remaining": -seats}},
+        return_document=ReturnDocument.AFTER,
+    )
+    return ledger is not None
+
+
+async def release_seats(experience_id: str, date_str: str, seats: int):
+    await capacity_collection.update_one(
+        {"experience_id": experience_id, "date": date_str},
+        {"$inc": {"remaining": seats}},
+    )
+
+
+async def remaining_seats(experience_id: str, date_str: str) -> int:
+    ledger = await capacity_collection.find_one({"experience_id": experience_id, "date": date_str})
+    return ledger["remaining"] if ledger else 0
+
+
+def normalize_reservation(res: Reservation) -> dict:
+    """Valida fecha y experiencia de una reserva y la deja lista para guardar (fecha ISO, num_personas >= 1)."""
     data = res.dict()
     # Validar fecha
     date_str = data.get("date")
@@ -64,52 +317,184 @@ def create_reservation(res: Reservation):
     today = datetime.utcnow().date()
     if parsed < today:
         raise HTTPException(status_code=400, detail="No se pueden reservar fechas anteriores a hoy")
-
-    # Validar cupo disponible y descontar cupo real
-    experience_id = data.get("experience_id")
-    if not experience_id:
+    # Misma fecha, mismo cupo: se guarda siempre en formato ISO
+    data["date"] = parsed.isoformat()
+    if not data.get("experience_id"):
         raise HTTPException(status_code=400, detail="ID de experiencia requerido")
-    num_personas = int(data.get("num_personas", 1))
-    if num_personas < 1:
-        num_personas = 1
-    EXPERIENCES_URL = os.getenv("EXPERIENCES_SERVICE_URL", "http://experiences-service:8002")
+    data["num_personas"] = max(1, int(data.get("num_personas", 1)))
+    # Ensure attended defaults to False if not provided
+    data["attended"] = data.get("attended", False)
+    return data
+
+
+def parse_iso_date(value: str, field: str):
     try:
-        resp = requests.get(f"{EXPERIENCES_URL}/experiences/{experience_id}", timeout=5)
-        exp_data = resp.json().get("experience")
-        cupo = int(exp_data.get("cupo", 1)) if exp_data else 1
-    except Exception:
-        cupo = 1
-
-    # Sumar el total de personas reservadas para esa experiencia y fecha
-    reservas_actuales = 0
-    for r in reservations_collection.find({"experience_id": experience_id, "date": date_str}):
-        reservas_actuales += int(r.get("num_personas", 1))
-    if reservas_actuales + num_personas > cupo:
-        raise HTTPException(status_code=400, detail=f"No hay cupos suficientes. Cupo disponible: {cupo - reservas_actuales}")
-
-    # Descontar cupo real en la experiencia
-    nuevo_cupo = cupo - num_personas
-    if nuevo_cupo < 0:
-        nuevo_cupo = 0
-    if exp_data:
-        exp_data["cupo"] = nuevo_cupo
-        # PUT para actualizar el cupo en la experiencia
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Fecha inválida en '{field}' (formato YYYY-MM-DD)")
+
+
+@app.get("/availability")
+async def availability(experience_ids: str, date_from: Optional[str] = None, date_to: Optional[str] = None, days: int = 30):
+    """Plazas libres por fecha para una o varias experiencias (ids separados por comas).
+
+    Se lee del registro de cupos (una consulta por índice sobre el rango), sin
+    recorrer las reservas: una fecha sin registro aún no tiene reservas y
+    conserva el cupo completo de la experiencia.
+    """
+    ids = list(dict.fromkeys(i for i in experience_ids.split(",") if i))
+    if not ids:
+        raise HTTPException(status_code=400, detail="Indica al menos una experiencia")
+    if len(ids) > AVAILABILITY_MAX_EXPERIENCES:
+        raise HTTPException(status_code=400, detail=f"Máximo {AVAILABILITY_MAX_EXPERIENCES} experiencias por consulta")
+    today = datetime.utcnow().date()
+    start = max(parse_iso_date(date_from, "date_from"), today) if date_from else today
+    end = parse_iso_date(date_to, "date_to") if date_to else start + timedelta(days=max(days, 1) - 1)
+    if end < start:
+        raise HTTPException(status_code=400, detail="'date_to' debe ser posterior a 'date_from'")
+    if (end - start).days + 1 > AVAILABILITY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {AVAILABILITY_MAX_DAYS} días")
+
+    experiences = await experience_cache.get_many(ids)
+    ledgers = {}
+    async for ledger in capacity_collection.find(
+        {"experience_id": {"$in": ids}, "date": {"$gte": start.isoformat(), "$lte": end.isoformat()}},
+        {"_id": 0, "experience_id": 1, "date": 1, "capacity": 1, "remaining": 1},
+    ):
+        ledgers[(ledger["experience_id"], ledger["date"])] = ledger
+
+    dates = [(start + timedelta(days=n)).isoformat() for n in range((end - start).days + 1)]
+    result = {}
+    for exp_id in ids:
+        exp = experiences.get(exp_id)
+        if exp is None:
+            continue
         try:
-            put_resp = requests.put(f"{EXPERIENCES_URL}/experiences/{experience_id}", json=exp_data, timeout=5)
-            if put_resp.status_code != 200:
-                raise HTTPException(status_code=500, detail="No se pudo actualizar el cupo de la experiencia")
-        except Exception:
-            raise HTTPException(status_code=500, detail="Error al actualizar el cupo de la experiencia")
+            cupo = int(exp.get("cupo", 1))
+        except (TypeError, ValueError):
+            cupo = 1
+        per_date = {}
+        for date_str in dates:
+            ledger = ledgers.get((exp_id, date_str))
+            # Si el guía cambió el cupo, el registro se ajusta en la próxima reserva; aquí ya se refleja
+            per_date[date_str] = max(0, ledger["remaining"] + cupo - ledger["capacity"]) if ledger else cupo
+        result[exp_id] = {"cupo": cupo, "remaining": per_date}
+    return {
+        "date_from": start.isoformat(),
+        "date_to": end.isoformat(),
+        "experiences": result,
+        "missing": [exp_id for exp_id in ids if exp_id not in result],
+    }
 
-    # Ensure attended defaults to False if not provided
-    data["attended"] = data.get("attended", False)
-    result = reservations_collection.insert_one({k: v for k, v in data.items() if k != "id"})
+
+@app.post("/reservations")
+async def create_reservation(res: Reservation):
+    data = normalize_reservation(res)
+    experience_id, date_str, num_personas = data["experience_id"], data["date"], data["num_personas"]
+
+    # Validar cupo disponible y descontarlo de forma atómica
+    await ensure_ledger(experience_id, date_str, await fetch_cupo(experience_id))
+    if not await reserve_seats(experience_id, date_str, num_personas):
+        raise HTTPException(status_code=400, detail=f"No hay cupos suficientes. Cupo disponible: {await remaining_seats(experience_id, date_str)}")
+
+    try:
+        result = await reservations_collection.insert_one({k: v for k, v in data.items() if k != "id"})
+    except Exception:
+        await release_seats(experience_id, date_str, num_personas)
+        raise
     data["id"] = str(result.inserted_id)
     return data
 
+
+@app.post("/reservations/bulk")
+async def create_reservations_bulk(payload: BulkReservations):
+    """Crea varias reservas en una sola petición y devuelve un resultado por elemento.
+
+    Las plazas se descuentan de una vez por (experiencia, fecha); si no alcanzan
+    para todo el grupo se reservan en orden las que quepan. Las reservas aceptadas
+    se guardan con un único insert_many.
+    """
+    if len(payload.reservations) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_ITEMS} reservas por petición")
+    results = [None] * len(payload.reservations)
+    slots = {}  # (experience_id, date) -> [(índice, datos), ...]
+    for i, res in enumerate(payload.reservations):
+        try:
+            data = normalize_reservation(res)
+        except HTTPException as exc:
+            results[i] = {"index": i, "ok": False, "error": exc.detail}
+            continue
+        slots.setdefault((data["experience_id"], data["date"]), []).append((i, data))
+
+    experiences = await experience_cache.get_many(list({exp_id for exp_id, _ in slots}))
+    accepted = []
+    for (experience_id, date_str), items in slots.items():
+        try:
+            exp = experiences.get(experience_id)
+            # Las que no llegaron en el lote se piden una a una para distinguir 404 de 503
+            cupo = experience_cupo(exp) if exp else await fetch_cupo(experience_id)
+        except HTTPException as exc:
+            for i, _ in items:
+                results[i] = {"index": i, "ok": False, "error": exc.detail}
+            continue
+        await ensure_ledger(experience_id, date_str, cupo)
+        if await reserve_seats(experience_id, date_str, sum(d["num_personas"] for _, d in items)):
+            accepted.extend(items)
+            continue
+        for i, data in items:
+            if await reserve_seats(experience_id, date_str, data["num_personas"]):
+                accepted.append((i, data))
+            else:
+                results[i] = {"index": i, "ok": False, "error": "No hay cupos suficientes"}
+
+    if accepted:
+        docs = [{k: v for k, v in data.items() if k != "id"} for _, data in accepted]
+        failed = {}
+        try:
+            await reservations_collection.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            failed = {err["index"]: err.get("errmsg", "Error al guardar") for err in exc.details.get("writeErrors", [])}
+        for pos, (i, data) in enumerate(accepted):
+            if pos in failed:
+                await release_seats(data["experience_id"], data["date"], data["num_personas"])
+                results[i] = {"index": i, "ok": False, "error": failed[pos]}
+            else:
+                data["id"] = str(docs[pos]["_id"])
+                results[i] = {"index": i, "ok": True, "reservation": data}
+
+    created = sum(1 for r in results if r["ok"])
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+@app.post("/reservations/attend")
+async def mark_attended_bulk(payload: BulkAttendance):
+    """Marca como asistidas varias reservas con un único update_many."""
+    if len(payload.ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo {BULK_MAX_ITEMS} reservas por petición")
+    object_ids = {}
+    for reservation_id in payload.ids:
+        if ObjectId.is_valid(reservation_id):
+            object_ids[reservation_id] = ObjectId(reservation_id)
+    found = {
+        str(doc["_id"]): bool(doc.get("attended", False))
+        async for doc in reservations_collection.find(
+            {"_id": {"$in": list(object_ids.values())}}, {"attended": 1}
+        )
+    }
+    pending = [object_ids[rid] for rid, attended in found.items() if not attended]
+    if pending:
+        await reservations_collection.update_many({"_id": {"$in": pending}}, {"$set": {"attended": True}})
+    results = []
+    for reservation_id in payload.ids:
+        if reservation_id not in found:
+            results.append({"id": reservation_id, "ok": False, "error": "Reserva no encontrada"})
+        else:
+            results.append({"id": reservation_id, "ok": True, "already_attended": found[reservation_id]})
+    return {"marked": len(pending), "results": results}
+
 @app.get("/reservations/{reservation_id}")
-def get_reservation(reservation_id: str):
-    reservation = reservations_collection.find_one({"_id": ObjectId(reservation_id)})
+async def get_reservation(reservation_id: str):
+    reservation = await reservations_collection.find_one({"_id": ObjectId(reservation_id)})
     if reservation:
         reservation["id"] = str(reservation["_id"])
         del reservation["_id"]
@@ -117,26 +502,46 @@ def get_reservation(reservation_id: str):
     return {"error": "Reserva no encontrada"}
 
 @app.put("/reservations/{reservation_id}")
-def update_reservation(reservation_id: str, res: Reservation):
-    data = res.dict()
+async def update_reservation(reservation_id: str, res: Reservation):
+    # Misma validación que al crear: la fecha queda en ISO y el cupo se cuenta en la misma clave del registro
+    data = normalize_reservation(res)
     if "id" in data:
         del data["id"]
-    result = reservations_collection.update_one({"_id": ObjectId(reservation_id)}, {"$set": data})
+    existing = await reservations_collection.find_one({"_id": ObjectId(reservation_id)})
+    if not existing:
+        return {"error": "No se pudo actualizar la reserva"}
+    old = (existing["experience_id"], existing["date"], int(existing.get("num_personas", 1)))
+    new = (data["experience_id"], data["date"], data["num_personas"])
+    if new[:2] == old[:2] and new[2] < old[2]:
+        # Menos personas en la misma fecha: solo se liberan las plazas sobrantes
+        await release_seats(old[0], old[1], old[2] - new[2])
+    elif new != old:
+        # Primero se ocupan las plazas nuevas (o las adicionales) y, si hay cupo, se liberan las anteriores
+        same_slot = new[:2] == old[:2]
+        seats = new[2] - old[2] if same_slot else new[2]
+        await ensure_ledger(new[0], new[1], await fetch_cupo(new[0]))
+        if not await reserve_seats(new[0], new[1], seats):
+            raise HTTPException(status_code=400, detail=f"No hay cupos suficientes. Cupo disponible: {await remaining_seats(new[0], new[1])}")
+        if not same_slot:
+            await release_seats(*old)
+    result = await reservations_collection.update_one({"_id": ObjectId(reservation_id)}, {"$set": data})
     if result.modified_count:
         return {"msg": "Reserva actualizada"}
     return {"error": "No se pudo actualizar la reserva"}
 
 
 @app.post("/reservations/{reservation_id}/attend")
-def mark_attended(reservation_id: str):
-    result = reservations_collection.update_one({"_id": ObjectId(reservation_id)}, {"$set": {"attended": True}})
+async def mark_attended(reservation_id: str):
+    result = await reservations_collection.update_one({"_id": ObjectId(reservation_id)}, {"$set": {"attended": True}})
     if result.modified_count:
         return {"msg": "Reserva marcada como asistida"}
     return {"error": "No se pudo marcar asistencia"}
 
 @app.delete("/reservations/{reservation_id}", response_model=dict)
-def delete_reservation(reservation_id: str):
-    result = reservations_collection.delete_one({"_id": ObjectId(reservation_id)})
-    if result.deleted_count:
+async def delete_reservation(reservation_id: str):
+    deleted = await reservations_collection.find_one_and_delete({"_id": ObjectId(reservation_id)})
+    if deleted:
+        # Las plazas de la reserva eliminada vuelven a quedar libres
+        await release_seats(deleted["experience_id"], deleted["date"], int(deleted.get("num_personas", 1)))
         return {"msg": "Reserva eliminada"}
     return {"error": "No se pudo eliminar la reserva"}
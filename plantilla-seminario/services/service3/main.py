@@ -1,17 +1,196 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, UpdateMany
 from bson import ObjectId
+from common.helpers.ndjson_export import export_response
+from common.helpers.query_plans import plan_summary
+import httpx
+import os
 
 # FastAPI app
 app = FastAPI()
 
-# MongoDB connection
-MONGO_DETAILS = "mongodb://mongo:27017"
-client = AsyncIOMotorClient(MONGO_DETAILS)
+# MongoDB connection (pool de conexiones configurable por entorno)
+MONGO_DETAILS = os.getenv("MONGO_DETAILS", "mongodb://mongo:27017")
+client = AsyncIOMotorClient(
+    MONGO_DETAILS,
+    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+)
 db = client.ratings_db
 ratings_collection = db.get_collection("ratings")
+# Agregados por experiencia y por guía (conteo, suma, histograma), mantenidos en cada alta/baja
+rating_stats_collection = db.get_collection("rating_stats")
+# Colección temporal donde se recalculan los agregados antes de sustituir a rating_stats
+RATING_STATS_REBUILD = "rating_stats_rebuild"
+
+# Servicio de experiencias: se consulta al crear una valoración para guardar el guía de la experiencia
+EXPERIENCES_URL = os.getenv("EXPERIENCES_SERVICE_URL", "http://experiences-service:8002")
+experiences_client: Optional[httpx.AsyncClient] = None
+
+# Índices para filtrar valoraciones por experiencia y por usuario
+INDEXES = [
+    IndexModel([("experience_id", ASCENDING)], name="experience"),
+    IndexModel([("user_id", ASCENDING)], name="user"),
+    # Valoraciones de un guía, más recientes primero (campo guía o $in de sus experiencias)
+    IndexModel([("guide", ASCENDING), ("_id", DESCENDING)], name="guide_newest"),
+    IndexModel([("experience_id", ASCENDING), ("_id", DESCENDING)], name="experience_newest"),
+]
+
+# Tamaño de página de /ratings/guide/{guide}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+# Documentos por lote en /ratings/export
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Consultas frecuentes cuyo plan se verifica en /diagnostics/query-plans
+HOT_QUERIES = {
+    "ratings_by_experience": lambda: ratings_collection.find({"experience_id": "__probe__"}),
+    "ratings_by_guide": lambda: ratings_collection.find(
+        {"$or": [{"guide": "__probe__"}, {"experience_id": {"$in": ["__probe__"]}}]}
+    ).sort("_id", DESCENDING),
+}
+
+
+@app.on_event("startup")
+async def startup():
+    global experiences_client
+    experiences_client = httpx.AsyncClient(base_url=EXPERIENCES_URL, timeout=3)
+    await ratings_collection.create_indexes(INDEXES)
+    if await rating_stats_collection.estimated_document_count() == 0 or await backfill_guides():
+        await rebuild_rating_stats()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await experiences_client.aclose()
+
+
+async def fetch_guide(experience_id: str) -> Optional[str]:
+    try:
+        resp = await experiences_client.get(f"/experiences/{experience_id}")
+        experience = resp.json().get("experience")
+        return experience.get("guide") if experience else None
+    except Exception:
+        return None
+
+
+async def fetch_guide_experiences(guide: str) -> dict:
+    """Títulos de las experiencias del guía (id -> título), recorriendo el listado paginado."""
+    titles, cursor = {}, None
+    try:
+        while True:
+            params = {"guide": guide, "fields": "title", "limit": 500}
+            if cursor:
+                params["cursor"] = cursor
+            resp = await experiences_client.get("/experiences", params=params)
+            resp.raise_for_status()
+            page = resp.json()
+            titles.update({exp["id"]: exp.get("title", "") for exp in page.get("experiences", [])})
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return titles
+    except Exception:
+        return titles
+
+
+# Ids por consulta a /experiences/lookup (MAX_LOOKUP_IDS del servicio de experiencias)
+LOOKUP_BATCH_SIZE = 500
+
+
+async def fetch_guides(experience_ids: List[str]) -> dict:
+    """Guía de muchas experiencias (id -> guía) con consultas por lote al servicio de experiencias."""
+    guides = {}
+    for start in range(0, len(experience_ids), LOOKUP_BATCH_SIZE):
+        batch = experience_ids[start:start + LOOKUP_BATCH_SIZE]
+        try:
+            resp = await experiences_client.post("/experiences/lookup", json={"ids": batch, "fields": ["guide"]})
+            resp.raise_for_status()
+        except Exception:
+            continue
+        guides.update({exp["id"]: exp["guide"] for exp in resp.json().get("experiences", []) if exp.get("guide")})
+    return guides
+
+
+async def backfill_guides() -> int:
+    """Guarda el guía en las valoraciones que no lo tienen (anteriores al campo o con el
+    servicio de experiencias caído al crearlas). Devuelve cuántas se han completado."""
+    experience_ids = await ratings_collection.distinct("experience_id", {"guide": None})
+    if not experience_ids:
+        return 0
+    guides = await fetch_guides(experience_ids)
+    if not guides:
+        return 0
+    result = await ratings_collection.bulk_write(
+        [UpdateMany({"experience_id": eid, "guide": None}, {"$set": {"guide": guide}}) for eid, guide in guides.items()],
+        ordered=False,
+    )
+    return result.modified_count
+
+
+def stats_keys(rating: dict) -> List[str]:
+    """Documentos de agregados a los que contribuye una valoración."""
+    keys = [f"experience:{rating['experience_id']}"]
+    if rating.get("guide"):
+        keys.append(f"guide:{rating['guide']}")
+    return keys
+
+
+async def apply_rating_stats(rating: dict, sign: int) -> None:
+    """Suma (sign=1) o resta (sign=-1) una valoración a sus agregados con un $inc atómico."""
+    update = {
+        "$inc": {"count": sign, "sum": sign * rating["rating"], f"histogram.{rating['rating']}": sign},
+        "$set": {"last_updated": datetime.utcnow()},
+    }
+    for key in stats_keys(rating):
+        await rating_stats_collection.update_one({"_id": key}, update, upsert=True)
+
+
+async def rebuild_rating_stats() -> int:
+    """Recalcula los agregados desde las valoraciones (arranque con la colección vacía o a petición).
+
+    Antes completa el guía que falte en las valoraciones, para que los agregados por guía
+    cuenten las mismas valoraciones que /ratings/guide/{guide}.
+    """
+    await backfill_guides()
+    stats = {}
+    async for rating in ratings_collection.find({}, {"experience_id": 1, "guide": 1, "rating": 1}):
+        for key in stats_keys(rating):
+            entry = stats.setdefault(key, {"count": 0, "sum": 0, "histogram": {}})
+            entry["count"] += 1
+            entry["sum"] += rating["rating"]
+            star = str(rating["rating"])
+            entry["histogram"][star] = entry["histogram"].get(star, 0) + 1
+    now = datetime.utcnow()
+    if not stats:
+        await rating_stats_collection.delete_many({})
+        return 0
+    # Se construye aparte y se sustituye con un rename atómico: las lecturas nunca
+    # ven la colección vacía o a medias.
+    rebuild_collection = db.get_collection(RATING_STATS_REBUILD)
+    await rebuild_collection.drop()
+    await rebuild_collection.insert_many(
+        [{"_id": key, **entry, "last_updated": now} for key, entry in stats.items()]
+    )
+    await rebuild_collection.rename(rating_stats_collection.name, dropTarget=True)
+    return len(stats)
+
+
+def stats_helper(doc: Optional[dict]) -> dict:
+    count = doc["count"] if doc else 0
+    total = doc["sum"] if doc else 0
+    histogram = doc.get("histogram", {}) if doc else {}
+    return {
+        "count": count,
+        "sum": total,
+        "average": round(total / count, 2) if count else None,
+        "histogram": {str(star): histogram.get(str(star), 0) for star in range(1, 6)},
+        "last_updated": doc.get("last_updated") if doc else None,
+    }
+
 
 # Pydantic models
 
@@ -19,11 +198,12 @@ class Rating(BaseModel):
     user_id: str
     username: str
     experience_id: str
-    comment: str
+    comment: str = ""
     rating: int
 
 class RatingResponse(Rating):
     id: str
+    guide: Optional[str] = None
 
 # Helper function to serialize MongoDB documents
 def rating_helper(rating) -> dict:
@@ -32,23 +212,111 @@ def rating_helper(rating) -> dict:
         "user_id": rating["user_id"],
         "username": rating.get("username", ""),
         "experience_id": rating["experience_id"],
-        "comment": rating["comment"],
+        "comment": rating.get("comment", ""),
         "rating": rating["rating"],
+        "guide": rating.get("guide"),
     }
 
+def export_helper(rating) -> dict:
+    rating["id"] = str(rating.pop("_id"))
+    return rating
+
 # Routes
 @app.post("/ratings", response_model=RatingResponse)
 async def create_rating(rating: Rating):
-    new_rating = await ratings_collection.insert_one(rating.dict())
-    created_rating = await ratings_collection.find_one({"_id": new_rating.inserted_id})
-    return rating_helper(created_rating)
+    if not 1 <= rating.rating <= 5:
+        raise HTTPException(status_code=400, detail="La valoración debe estar entre 1 y 5")
+    doc = rating.dict()
+    doc["guide"] = await fetch_guide(rating.experience_id)
+    new_rating = await ratings_collection.insert_one(doc)
+    await apply_rating_stats(doc, 1)
+    # La respuesta se arma con lo insertado; no hace falta volver a leerlo
+    doc["_id"] = new_rating.inserted_id
+    return rating_helper(doc)
 
 @app.get("/ratings", response_model=List[RatingResponse])
-async def get_ratings():
+async def get_ratings(
+    experience_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    guide: Optional[str] = None,
+):
+    """Valoraciones filtradas por experiencia, usuario y/o guía (todas si no se filtra)."""
+    query = {}
+    if experience_id:
+        query["experience_id"] = experience_id
+    if user_id:
+        query["user_id"] = user_id
+    if guide:
+        titles = await fetch_guide_experiences(guide)
+        query["$or"] = [{"guide": guide}, {"experience_id": {"$in": list(titles)}}]
+    return [rating_helper(rating) async for rating in ratings_collection.find(query)]
+
+@app.get("/ratings/stats/experience/{experience_id}")
+async def experience_rating_stats(experience_id: str):
+    return stats_helper(await rating_stats_collection.find_one({"_id": f"experience:{experience_id}"}))
+
+
+@app.get("/ratings/stats/experiences")
+async def experiences_rating_stats(ids: str):
+    """Agregados de varias experiencias (ids separados por comas) en una sola lectura."""
+    exp_ids = [i for i in ids.split(",") if i]
+    docs = {
+        doc["_id"]: doc
+        async for doc in rating_stats_collection.find({"_id": {"$in": [f"experience:{i}" for i in exp_ids]}})
+    }
+    return {exp_id: stats_helper(docs.get(f"experience:{exp_id}")) for exp_id in exp_ids}
+
+
+@app.get("/ratings/stats/guide/{guide}")
+async def guide_rating_stats(guide: str):
+    return stats_helper(await rating_stats_collection.find_one({"_id": f"guide:{guide}"}))
+
+
+@app.post("/ratings/stats/rebuild")
+async def rebuild_stats():
+    return {"rebuilt": await rebuild_rating_stats()}
+
+
+@app.get("/ratings/guide/{guide}")
+async def ratings_for_guide(guide: str, limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None):
+    """Valoraciones de las experiencias de un guía, más recientes primero, con el título de cada experiencia.
+
+    Se consultan por índice las valoraciones con el guía guardado o de alguna de sus
+    experiencias, así que el coste depende de las valoraciones del guía y no del total.
+    Paginado por cursor: `next_cursor` se pasa como `cursor` para la página siguiente.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    titles = await fetch_guide_experiences(guide)
+    query = {"$or": [{"guide": guide}, {"experience_id": {"$in": list(titles)}}]}
+    if cursor:
+        if not ObjectId.is_valid(cursor):
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        query = {"$and": [query, {"_id": {"$lt": ObjectId(cursor)}}]}
+    docs = await ratings_collection.find(query).sort("_id", DESCENDING).limit(limit + 1).to_list(limit + 1)
     ratings = []
-    async for rating in ratings_collection.find():
-        ratings.append(rating_helper(rating))
-    return ratings
+    for doc in docs[:limit]:
+        rating = rating_helper(doc)
+        rating["experience_title"] = titles.get(doc["experience_id"]) or doc["experience_id"]
+        ratings.append(rating)
+    next_cursor = str(docs[limit - 1]["_id"]) if len(docs) > limit else None
+    return {"guide": guide, "ratings": ratings, "next_cursor": next_cursor}
+
+
+@app.get("/ratings/export")
+async def export_ratings(since: Optional[str] = None, batch_size: int = EXPORT_BATCH_SIZE, gzip: bool = False):
+    """Exporta las valoraciones en NDJSON (orden de _id) directamente desde el cursor.
+
+    Para reanudar una exportación se pasa en `since` el último id recibido.
+    """
+    query = {}
+    if since:
+        if not ObjectId.is_valid(since):
+            raise HTTPException(status_code=400, detail="'since' debe ser un id de valoración")
+        query["_id"] = {"$gt": ObjectId(since)}
+    batch_size = max(1, min(batch_size, EXPORT_BATCH_SIZE))
+    cursor = ratings_collection.find(query).sort("_id", ASCENDING).batch_size(batch_size)
+    return export_response(cursor, export_helper, batch_size, gzip)
+
 
 @app.get("/ratings/{id}", response_model=RatingResponse)
 async def get_rating(id: str):
@@ -59,11 +327,17 @@ async def get_rating(id: str):
 
 @app.delete("/ratings/{id}")
 async def delete_rating(id: str):
-    delete_result = await ratings_collection.delete_one({"_id": ObjectId(id)})
-    if delete_result.deleted_count == 1:
+    deleted = await ratings_collection.find_one_and_delete({"_id": ObjectId(id)})
+    if deleted:
+        await apply_rating_stats(deleted, -1)
         return {"message": "Rating deleted successfully"}
     raise HTTPException(status_code=404, detail="Rating not found")
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/diagnostics/query-plans")
+async def query_plans():
+    return {name: plan_summary(await query().explain()) for name, query in HOT_QUERIES.items()}